@@ -0,0 +1,134 @@
+"""
+Retention for the moment tables.
+
+Moments whose whole thread (the moment, its replies and read receipts) has
+been quiet for ARCHIVE_HORIZON_DAYS are moved, with their recipients and
+replies, to the archive tables (ArchivedMoment and friends), so the hot
+tables and the indexes every feed query walks only hold recent history.
+Each batch of ARCHIVE_BATCH_SIZE moments moves in a transaction of its own,
+locking just the rows it moves.
+
+Archived rows keep their ids, timestamps and media names. The references to
+media blobs move along with them, so MediaBlob ref counts are left as they
+are. Feeds that page back past the newest archived moment carry on into the
+archive (see amoments_page). Archived moments are read-only.
+"""
+import logging
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+from core.models import ArchivedMoment, ArchivedMomentRecipient, ArchivedReply, Moment, MomentRecipient, Reply
+from . import counters
+from .feeds import amoments_feed
+
+logger = logging.getLogger(__name__)
+
+NEWEST_ARCHIVED_KEY = 'archive:newest'
+
+
+def archivable(cutoff):
+    """Moments with no activity at all since `cutoff`."""
+    return (
+        Moment.objects.filter(created_at__lt=cutoff, updated_at__lt=cutoff)
+        .exclude(replies__updated_at__gte=cutoff)
+        .exclude(recipients__updated_at__gte=cutoff)
+    )
+
+
+def _copy(queryset, archive_model):
+    # Locked as they are read, so a concurrent write waits and then finds the row gone
+    fields = [field.attname for field in archive_model._meta.concrete_fields if field.name != 'archived_at']
+    rows = queryset.select_for_update().values(*fields)
+    archive_model.objects.bulk_create([archive_model(**row) for row in rows])
+
+
+def _release_counts(moment_ids):
+    # Unread moments and unseen replies stop counting once they leave the hot tables
+    unread = MomentRecipient.objects.filter(moment_id__in=moment_ids, read_at__isnull=True)
+    for row in unread.values('receiver_id').annotate(n=Count('id')).order_by():
+        counters.decrement([row['receiver_id']], 'moments', row['n'])
+
+    unseen = Reply.objects.filter(counters.unseen_replies(), parent_moment_id__in=moment_ids)
+    for row in unseen.values('parent_moment__sender_id').annotate(n=Count('id')).order_by():
+        counters.decrement([row['parent_moment__sender_id']], 'replies', row['n'])
+
+
+def _delete_moments(moment_ids):
+    # Plain SQL rather than QuerySet.delete(), which sends post_delete and so
+    # would release the media the archived copies still use (see api.signals).
+    # Their recipients and replies are already gone, so nothing else cascades.
+    connection = connections[router.db_for_write(Moment)]
+    placeholders = ', '.join(['%s'] * len(moment_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {connection.ops.quote_name(Moment._meta.db_table)} WHERE id IN ({placeholders})",
+            moment_ids,
+        )
+
+
+def archive_batch(cutoff, batch_size):
+    """Moves up to `batch_size` moments quiet since `cutoff` to the archive; returns how many moved."""
+    with transaction.atomic():
+        # Moments locked by a writer right now are left for the next run
+        moment_ids = list(
+            archivable(cutoff).select_for_update(skip_locked=True)
+            .order_by('updated_at', 'id').values_list('id', flat=True)[:batch_size]
+        )
+        if not moment_ids:
+            return 0
+
+        _copy(Moment.objects.filter(pk__in=moment_ids), ArchivedMoment)
+        _copy(MomentRecipient.objects.filter(moment_id__in=moment_ids), ArchivedMomentRecipient)
+        _copy(Reply.objects.filter(parent_moment_id__in=moment_ids), ArchivedReply)
+        _release_counts(moment_ids)
+
+        MomentRecipient.objects.filter(moment_id__in=moment_ids).delete()
+        Reply.objects.filter(parent_moment_id__in=moment_ids).delete()
+        _delete_moments(moment_ids)
+
+        transaction.on_commit(lambda: cache.delete(NEWEST_ARCHIVED_KEY))
+    return len(moment_ids)
+
+
+def archive_moments(horizon_days=None, batch_size=None, max_batches=None):
+    """Archives every moment quiet for `horizon_days`, batch by batch; returns how many moved."""
+    if horizon_days is None:
+        horizon_days = settings.ARCHIVE_HORIZON_DAYS
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    cutoff = timezone.now() - timedelta(days=horizon_days)
+
+    moved = batches = 0
+    while max_batches is None or batches < max_batches:
+        count = archive_batch(cutoff, batch_size)
+        if not count:
+            break
+        moved += count
+        batches += 1
+    logger.info(f"Archived {moved} moments quiet since {cutoff.isoformat()} in {batches} batches")
+    return moved
+
+
+def newest_archived():
+    """created_at of the newest archived moment, or None while the archive is empty."""
+    # Wrapped in a tuple so an empty archive is cached too
+    cached = cache.get(NEWEST_ARCHIVED_KEY)
+    if cached is None:
+        cached = (ArchivedMoment.objects.aggregate(newest=Max('created_at'))['newest'],)
+        cache.set(NEWEST_ARCHIVED_KEY, cached, settings.ARCHIVE_BOUNDARY_CACHE_TIMEOUT)
+    return cached[0]
+
+
+async def amoments_page(paginator, request, queryset, archived_queryset):
+    """
+    A keyset page of `queryset` as a flat feed, continued from the same query
+    on the archive once the page reaches back to the newest archived moment.
+    """
+    rows = await amoments_feed(paginator.page_queryset(queryset, request), request)
+    if paginator.reaches_before(rows, await sync_to_async(newest_archived)()):
+        archived = await amoments_feed(paginator.page_queryset(archived_queryset, request), request)
+        rows = paginator.merge_rows(rows, archived)
+    return paginator.build_page(rows, request)
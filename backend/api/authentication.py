@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+def user_cache_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+def invalidate_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that keeps the token's user in the cache for
+    AUTH_USER_CACHE_TIMEOUT seconds instead of loading it on every request.
+    Entries are dropped whenever the user is saved or deleted (see api.signals).
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            # Checks the user exists, is active and the token is not revoked
+            user = super().get_user(validated_token)
+            cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+            return user
+
+        # Same checks for a cached user; the entry may predate a deactivation
+        # that has not been invalidated yet
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed("The user's password has been changed.", code='password_changed')
+        return user
+
+
+class TokenUserReadAuthentication(CachedJWTAuthentication):
+    """
+    For read-only endpoints that need nothing but the user's id. With
+    AUTH_STATELESS_READS on, safe requests get a TokenUser built from the
+    token's claims without touching the cache or the database; the trade-off
+    is that deactivating a user only takes effect once their token expires.
+    """
+
+    def authenticate(self, request):
+        self.stateless = settings.AUTH_STATELESS_READS and request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        if not getattr(self, 'stateless', False):
+            return super().get_user(validated_token)
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken('Token contained no recognizable user identification')
+        return api_settings.TOKEN_USER_CLASS(validated_token)
@@ -0,0 +1,89 @@
+"""
+BlurHash encoder (https://blurha.sh).
+
+A BlurHash is a ~30 character string holding the first few cosine components
+of an image; clients decode it into a blurred placeholder and can paint it
+before the image itself has downloaded.
+"""
+import math
+from PIL import Image
+
+BASE83 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~'
+
+# The hash only keeps low frequencies, so a tiny sample encodes the same as the full image
+SAMPLE_SIZE = 32
+
+_SRGB_TO_LINEAR = [
+    v / 12.92 if v <= 0.04045 else ((v + 0.055) / 1.055) ** 2.4
+    for v in (i / 255 for i in range(256))
+]
+
+
+def _base83(value, length):
+    return ''.join(BASE83[(value // 83 ** (length - i - 1)) % 83] for i in range(length))
+
+
+def _linear_to_srgb(value):
+    v = max(0.0, min(1.0, value))
+    if v <= 0.0031308:
+        return int(v * 12.92 * 255 + 0.5)
+    return int((1.055 * v ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _sign_pow(value, exponent):
+    return math.copysign(abs(value) ** exponent, value)
+
+
+def encode(image, x_components=4, y_components=3):
+    """Returns the BlurHash of a PIL image."""
+    if not (1 <= x_components <= 9 and 1 <= y_components <= 9):
+        raise ValueError('BlurHash components must be between 1 and 9')
+
+    sample = image.convert('RGB').resize((SAMPLE_SIZE, SAMPLE_SIZE), Image.Resampling.BILINEAR)
+    width, height = sample.size
+    pixels = [
+        (_SRGB_TO_LINEAR[r], _SRGB_TO_LINEAR[g], _SRGB_TO_LINEAR[b])
+        for r, g, b in sample.getdata()
+    ]
+    cos_x = [[math.cos(math.pi * i * x / width) for x in range(width)] for i in range(x_components)]
+    cos_y = [[math.cos(math.pi * j * y / height) for y in range(height)] for j in range(y_components)]
+
+    factors = []
+    for j in range(y_components):
+        for i in range(x_components):
+            r = g = b = 0.0
+            for y in range(height):
+                row = y * width
+                basis_y = cos_y[j][y]
+                for x in range(width):
+                    basis = cos_x[i][x] * basis_y
+                    pr, pg, pb = pixels[row + x]
+                    r += basis * pr
+                    g += basis * pg
+                    b += basis * pb
+            scale = (1 if i == 0 and j == 0 else 2) / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    parts = [_base83((x_components - 1) + (y_components - 1) * 9, 1)]
+
+    if ac:
+        actual_max = max(abs(value) for factor in ac for value in factor)
+        quantised_max = int(max(0, min(82, math.floor(actual_max * 166 - 0.5))))
+        maximum = (quantised_max + 1) / 166
+        parts.append(_base83(quantised_max, 1))
+    else:
+        maximum = 1
+        parts.append(_base83(0, 1))
+
+    parts.append(_base83(
+        (_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4
+    ))
+    for factor in ac:
+        r, g, b = (
+            int(max(0, min(18, math.floor(_sign_pow(value / maximum, 0.5) * 9 + 9.5))))
+            for value in factor
+        )
+        parts.append(_base83(r * 19 * 19 + g * 19 + b, 2))
+
+    return ''.join(parts)
@@ -0,0 +1,31 @@
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from .events import user_group_name
+
+
+class ActivityConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Per-user activity stream. Clients fetch /api/activity/ once on connect and
+    then receive moments, replies and connection updates as they happen.
+    """
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+
+        self.group_name = user_group_name(user.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        # Application-level keepalive for clients behind aggressive proxies
+        if content.get('type') == 'ping':
+            await self.send_json({'type': 'pong'})
+
+    async def activity_event(self, event):
+        await self.send_json({'type': event['event'], 'data': event['data']})
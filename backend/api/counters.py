@@ -0,0 +1,58 @@
+"""
+Unread counters for the home screen badges.
+
+Counts are denormalized into one UnreadCounter row per user and adjusted in
+the same request that changes them, so a badge poll is a primary key lookup
+rather than aggregate queries. The row is created along with the user (see
+api.signals), so no change is ever missed; rows for users from before the
+counters were backfilled by migration 0013. Until a user first marks their
+replies seen (replies_seen_at is null), every reply from someone else counts.
+"""
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from core.models import Connection, MomentRecipient, Reply, UnreadCounter
+
+COUNTERS = ('moments', 'replies', 'pending_requests')
+
+
+def _ids(users):
+    return [getattr(user, 'pk', user) for user in users]
+
+
+def increment(users, counter, by=1):
+    UnreadCounter.objects.filter(user_id__in=_ids(users)).update(**{counter: F(counter) + by})
+
+
+def decrement(users, counter, by=1):
+    UnreadCounter.objects.filter(user_id__in=_ids(users)).update(**{counter: Greatest(F(counter) - by, 0)})
+
+
+def unseen_replies():
+    """Condition on Reply for replies their moment's sender has not seen yet."""
+    seen_at = 'parent_moment__sender__unread_counter__replies_seen_at'
+    return (Q(**{f'{seen_at}__isnull': True}) | Q(created_at__gt=F(seen_at))) & ~Q(sender_id=F('parent_moment__sender_id'))
+
+
+def count(user_id):
+    """Counts from the source tables, for initialising or checking a counter row."""
+    return {
+        'moments': MomentRecipient.objects.filter(receiver_id=user_id, read_at__isnull=True).count(),
+        'replies': Reply.objects.filter(unseen_replies(), parent_moment__sender_id=user_id).count(),
+        'pending_requests': Connection.objects.filter(receiver_id=user_id, status='PENDING').count(),
+    }
+
+
+def counters_for(user):
+    # Only the id is used, so this also works for token-only users
+    user_id = user.pk
+    values = UnreadCounter.objects.filter(user_id=user_id).values(*COUNTERS).first()
+    if values is None:
+        # Only for users created without signals (e.g. bulk_create)
+        counter, _ = UnreadCounter.objects.get_or_create(user_id=user_id, defaults=count(user_id))
+        values = {name: getattr(counter, name) for name in COUNTERS}
+    return values
+
+
+def mark_replies_seen(user):
+    UnreadCounter.objects.filter(user=user).update(replies=0, replies_seen_at=timezone.now())
@@ -0,0 +1,44 @@
+import asyncio
+import logging
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+def user_group_name(user_id):
+    return f"user_{user_id}"
+
+
+def publish_event(user_id, event_type, data):
+    """
+    Pushes an activity event to every open WebSocket of the given user.
+    Delivery is deferred until the surrounding transaction commits so clients
+    never receive events for rows they cannot fetch yet.
+    """
+    publish_events([user_id], event_type, data)
+
+
+def publish_events(user_ids, event_type, data):
+    """Like publish_event, for the same event going to several users."""
+    user_ids = list(user_ids)
+
+    async def _group_send(channel_layer):
+        message = {"type": "activity.event", "event": event_type, "data": data}
+        # Sent concurrently: a broadcast should not wait on each group in turn
+        results = await asyncio.gather(
+            *(channel_layer.group_send(user_group_name(user_id), message) for user_id in user_ids),
+            return_exceptions=True,
+        )
+        for user_id, result in zip(user_ids, results):
+            if isinstance(result, Exception):
+                logger.error(f"Failed to publish {event_type} event to user {user_id}: {result}")
+
+    def _send():
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        async_to_sync(_group_send)(channel_layer)
+
+    transaction.on_commit(_send)
@@ -0,0 +1,140 @@
+"""
+Personal data export.
+
+A user's history is streamed as a ZIP of NDJSON files, one JSON object per
+line, built while it is sent: rows are read with iterator(chunk_size=...)
+and compressed output leaves as soon as EXPORT_FLUSH_BYTES have built up, so
+memory use does not depend on how much history there is. Archived moments
+and replies (see api.archive) come first, followed by the hot ones.
+"""
+import itertools
+import zipfile
+import orjson
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from core.models import (
+    ArchivedMoment, ArchivedMomentRecipient, ArchivedReply, Connection,
+    Moment, MomentRecipient, Reply, UserProfilePhoto,
+)
+from .media import MEDIA_FIELDS
+
+PROFILE_FIELDS = ('id', 'username', 'email', 'avatar_emoji', 'invite_id', 'date_joined')
+MOMENT_FIELDS = {
+    'id': 'id', 'text': 'text', 'emoji': 'emoji', **{field: field for field in MEDIA_FIELDS},
+    'created_at': 'created_at', 'updated_at': 'updated_at',
+}
+
+
+class _Buffer:
+    """Write-only file object the ZIP is written into and drained from."""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        self.size = 0
+        return data
+
+
+def _rows(querysets, fields, **extra):
+    # `fields` maps output keys to lookups; hot and archived rows share them
+    for queryset in querysets:
+        for row in queryset.values(*fields.values()).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+            yield {**{key: row[lookup] for key, lookup in fields.items()}, **extra}
+
+
+def _media_rows(user):
+    rows = itertools.chain(
+        _rows([ArchivedMoment.objects.filter(sender=user).order_by('id')], MOMENT_FIELDS, source='moment'),
+        _rows([Moment.objects.filter(sender=user).order_by('id')], MOMENT_FIELDS, source='moment'),
+        _rows(
+            [UserProfilePhoto.objects.filter(user=user).order_by('id')],
+            {'id': 'id', **{field: field for field in MEDIA_FIELDS}}, source='profile_photo',
+        ),
+    )
+    for row in rows:
+        for field in MEDIA_FIELDS:
+            if row[field]:
+                yield {
+                    'source': row['source'], 'id': row['id'], 'field': field,
+                    'name': row[field], 'url': default_storage.url(row[field]),
+                }
+
+
+def _sections(user):
+    """(filename, rows) for each file of the export."""
+    def sent(model):
+        return model.objects.filter(sender=user).order_by('id')
+
+    def received(model):
+        return model.objects.filter(receiver=user).order_by('moment_id')
+
+    yield 'moments_sent.ndjson', _rows([sent(ArchivedMoment), sent(Moment)], MOMENT_FIELDS)
+    yield 'moment_recipients.ndjson', _rows(
+        [ArchivedMomentRecipient.objects.filter(moment__sender=user).order_by('moment_id', 'id'),
+         MomentRecipient.objects.filter(moment__sender=user).order_by('moment_id', 'id')],
+        {'moment_id': 'moment_id', 'receiver_id': 'receiver_id', 'receiver_username': 'receiver__username',
+         'read_at': 'read_at'},
+    )
+    yield 'moments_received.ndjson', _rows(
+        [received(ArchivedMomentRecipient), received(MomentRecipient)],
+        {'id': 'moment_id', 'sender_id': 'moment__sender_id', 'sender_username': 'moment__sender__username',
+         **{key: f'moment__{lookup}' for key, lookup in MOMENT_FIELDS.items() if key != 'id'},
+         'read_at': 'read_at'},
+    )
+    yield 'replies.ndjson', _rows(
+        [sent(ArchivedReply), sent(Reply)],
+        {'id': 'id', 'parent_moment_id': 'parent_moment_id', 'text': 'text', 'emoji': 'emoji',
+         'created_at': 'created_at', 'updated_at': 'updated_at'},
+    )
+    yield 'connections.ndjson', _rows(
+        [Connection.objects.filter(Q(requester=user) | Q(receiver=user)).order_by('id')],
+        {'id': 'id', 'requester_id': 'requester_id', 'requester_username': 'requester__username',
+         'receiver_id': 'receiver_id', 'receiver_username': 'receiver__username',
+         'status': 'status', 'created_at': 'created_at', 'updated_at': 'updated_at'},
+    )
+    yield 'media.ndjson', _media_rows(user)
+
+
+def export_chunks(user):
+    """Yields the bytes of `user`'s export ZIP, a piece at a time."""
+    buffer = _Buffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        profile = {field: getattr(user, field) for field in PROFILE_FIELDS}
+        archive.writestr('profile.json', orjson.dumps(profile, option=orjson.OPT_UTC_Z | orjson.OPT_INDENT_2))
+        for filename, rows in _sections(user):
+            # Entries can outgrow 4GB, which needs ZIP64 declared up front
+            with archive.open(filename, 'w', force_zip64=True) as entry:
+                for row in rows:
+                    entry.write(orjson.dumps(row, option=orjson.OPT_UTC_Z | orjson.OPT_APPEND_NEWLINE))
+                    if buffer.size >= settings.EXPORT_FLUSH_BYTES:
+                        yield buffer.drain()
+    yield buffer.drain()
+
+
+async def aexport_chunks(user):
+    """
+    export_chunks for ASGI, where Django reads a sync iterator to the end before
+    sending any of it. Each piece is produced on the request's sync thread, so the
+    database cursors stay on the connection that opened them.
+    """
+    chunks = export_chunks(user)
+    next_chunk = sync_to_async(next)
+    while True:
+        chunk = await next_chunk(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
@@ -0,0 +1,143 @@
+"""
+Flat, read-only serialization for the list endpoints.
+
+Builds the same payloads as MomentSerializer and ReplySerializer directly
+from .values() rows, skipping model instantiation and DRF field machinery,
+which dominate the cost of a feed page. Related users come from joins in the
+same queries, and each moment's latest replies plus its reply total from one
+windowed query, so a page takes two queries whatever its size.
+
+A moment can go to several people, who need not be connected to each other:
+each sees only the sender's replies and their own (see visible_replies).
+
+Keep these in step with the serializers: clients must not be able to tell
+which one produced a response.
+"""
+from collections import defaultdict
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+from core.models import Moment
+
+# As NestedUserSerializer: no email, since other recipients see these too
+USER_FIELDS = ('id', 'username', 'avatar_emoji', 'invite_id')
+IMAGE_FIELDS = ('image', 'image_thumbnail', 'image_medium')
+
+MOMENT_VALUES = (
+    'id', 'text', 'emoji', *IMAGE_FIELDS, 'image_width', 'image_height', 'image_blurhash', 'created_at',
+    *(f'sender__{field}' for field in USER_FIELDS),
+)
+REPLY_VALUES = (
+    'id', 'text', 'emoji', 'created_at', 'updated_at', 'parent_moment_id',
+    *(f'sender__{field}' for field in USER_FIELDS),
+)
+
+
+def _sender(row):
+    return {field: row[f'sender__{field}'] for field in USER_FIELDS}
+
+
+def _media_url(name, request=None):
+    # Absolute when there is a request, as DRF's file fields render them
+    if not name:
+        return None
+    url = default_storage.url(name)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def visible_replies(user_id):
+    """Condition on Reply (or ArchivedReply) for the replies `user_id` may see in a moment's thread."""
+    return Q(parent_moment__sender_id=user_id) | Q(sender_id=user_id) | Q(sender_id=F('parent_moment__sender_id'))
+
+
+def _viewer_id(request):
+    return request.user.pk if request is not None else None
+
+
+def reply_values(queryset):
+    return queryset.values(*REPLY_VALUES)
+
+
+def reply_data(row):
+    return {
+        'id': row['id'],
+        'sender': _sender(row),
+        'text': row['text'],
+        'emoji': row['emoji'],
+        'created_at': row['created_at'],
+        'updated_at': row['updated_at'],
+        'parent_moment': row['parent_moment_id'],
+    }
+
+
+def moment_values(queryset):
+    return queryset.values(*MOMENT_VALUES)
+
+
+def latest_reply_values(moment_ids, moment_model=Moment, viewer_id=None):
+    """
+    The latest FEED_REPLY_LIMIT replies of each moment, each row carrying its
+    moment's reply total; both limited to what `viewer_id` may see, if given.
+    """
+    # Reply, or ArchivedReply for archived moments
+    replies = moment_model._meta.get_field('replies').related_model.objects.filter(parent_moment_id__in=moment_ids)
+    if viewer_id is not None:
+        replies = replies.filter(visible_replies(viewer_id))
+    by_moment = {'partition_by': F('parent_moment_id')}
+    return (
+        replies
+        .annotate(
+            position=Window(RowNumber(), order_by=(F('created_at').desc(), F('id').desc()), **by_moment),
+            moment_reply_count=Window(Count('id'), **by_moment),
+        )
+        .filter(position__lte=settings.FEED_REPLY_LIMIT)
+        .values(*REPLY_VALUES, 'moment_reply_count')
+    )
+
+
+def moment_data(moment_rows, reply_rows, request=None):
+    replies = defaultdict(list)
+    reply_counts = {}
+    for row in reply_rows:
+        replies[row['parent_moment_id']].append(row)
+        reply_counts[row['parent_moment_id']] = row['moment_reply_count']
+
+    data = []
+    for row in moment_rows:
+        # Oldest first, as the thread is displayed
+        thread = sorted(replies.get(row['id'], ()), key=lambda r: (r['created_at'], r['id']))
+        item = {
+            'id': row['id'],
+            'sender': _sender(row),
+            'text': row['text'],
+            'emoji': row['emoji'],
+        }
+        item.update({field: _media_url(row[field], request) for field in IMAGE_FIELDS})
+        item.update({
+            'image_width': row['image_width'],
+            'image_height': row['image_height'],
+            'image_blurhash': row['image_blurhash'],
+            'created_at': row['created_at'],
+            'replies': [reply_data(reply) for reply in thread],
+            'reply_count': reply_counts.get(row['id'], 0),
+        })
+        data.append(item)
+    return data
+
+
+def moments_feed(queryset, request=None):
+    moment_rows = list(moment_values(queryset))
+    reply_rows = latest_reply_values([row['id'] for row in moment_rows], queryset.model, _viewer_id(request))
+    return moment_data(moment_rows, reply_rows, request)
+
+
+async def amoments_feed(queryset, request=None):
+    moment_rows = [row async for row in moment_values(queryset)]
+    reply_rows = latest_reply_values([row['id'] for row in moment_rows], queryset.model, _viewer_id(request))
+    reply_rows = [row async for row in reply_rows]
+    return moment_data(moment_rows, reply_rows, request)
+
+
+async def areplies_feed(queryset):
+    return [reply_data(row) async for row in reply_values(queryset)]
@@ -0,0 +1,100 @@
+"""
+Cached social graph.
+
+Each user's set of ACCEPTED connections is cached in the shared cache (Redis in
+production) under a per-user version number, and memoised in-process for as
+long as that version is current. Invalidation bumps the version, so a check
+costs one cache round-trip and never touches the database on the hot path.
+"""
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Q
+from core.models import Connection
+from .versioning import bump_version, current_version
+
+_local = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def _user_id(user):
+    return getattr(user, 'pk', user)
+
+
+def _version_key(user_id):
+    return f"graph:version:{user_id}"
+
+
+def _adjacency_key(user_id, version):
+    return f"graph:adjacency:{user_id}:{version}"
+
+
+def _load_connections(user_id):
+    # From the primary: a lagging replica's answer would be cached as current
+    rows = Connection.objects.using(DEFAULT_DB_ALIAS).filter(
+        Q(requester_id=user_id) | Q(receiver_id=user_id), status='ACCEPTED'
+    ).values_list('requester_id', 'receiver_id')
+    return {receiver_id if requester_id == user_id else requester_id for requester_id, receiver_id in rows}
+
+
+def connections_of(user):
+    """Returns the frozenset of user ids `user` is ACCEPTED-connected to."""
+    user_id = _user_id(user)
+    version = current_version(_version_key(user_id))
+
+    with _local_lock:
+        entry = _local.get(user_id)
+        if entry is not None and entry[0] == version:
+            _local.move_to_end(user_id)
+            return entry[1]
+
+    key = _adjacency_key(user_id, version)
+    ids = cache.get(key)
+    if ids is None:
+        ids = _load_connections(user_id)
+        cache.set(key, list(ids), settings.GRAPH_CACHE_TIMEOUT)
+    ids = frozenset(ids)
+
+    with _local_lock:
+        _local[user_id] = (version, ids)
+        _local.move_to_end(user_id)
+        while len(_local) > settings.GRAPH_LOCAL_CACHE_SIZE:
+            _local.popitem(last=False)
+    return ids
+
+
+def is_connected(user_a, user_b):
+    return _user_id(user_b) in connections_of(user_a)
+
+
+def mutuals(user_a, user_b):
+    return connections_of(user_a) & connections_of(user_b)
+
+
+def mutual_counts(user, others):
+    """
+    Number of mutual connections between `user` and each of `others`, from a
+    single query over the edges joining the two sets.
+    """
+    mine = connections_of(user)
+    other_ids = {_user_id(other) for other in others}
+    counts = dict.fromkeys(other_ids, 0)
+    if not mine or not other_ids:
+        return counts
+
+    rows = Connection.objects.filter(status='ACCEPTED').filter(
+        Q(low_user_id__in=other_ids, high_user_id__in=mine) | Q(high_user_id__in=other_ids, low_user_id__in=mine)
+    ).values_list('low_user_id', 'high_user_id')
+    for low_id, high_id in rows:
+        if low_id in other_ids and high_id in mine:
+            counts[low_id] += 1
+        if high_id in other_ids and low_id in mine:
+            counts[high_id] += 1
+    return counts
+
+
+def invalidate(*users):
+    for user in users:
+        bump_version(_version_key(_user_id(user)))
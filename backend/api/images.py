@@ -0,0 +1,97 @@
+"""
+Upload pipeline for moment and profile photos.
+
+Phones upload multi-megabyte originals with EXIF (including GPS position).
+After upload a Celery task re-encodes the original without metadata, capped at
+IMAGE_MAX_DIMENSION, and renders thumbnail and medium variants in
+IMAGE_VARIANT_FORMAT, so feeds never have to ship the original. It also
+records the dimensions and a BlurHash placeholder so clients can lay out and
+paint a moment before any image bytes arrive.
+"""
+import io
+import logging
+from django.conf import settings
+from PIL import Image, ImageOps, UnidentifiedImageError
+from . import blurhash
+from .media import media_names, store_blob
+
+logger = logging.getLogger(__name__)
+
+# Variant field on the model -> longest edge in pixels
+VARIANTS = {
+    'image_thumbnail': settings.IMAGE_THUMBNAIL_SIZE,
+    'image_medium': settings.IMAGE_MEDIUM_SIZE,
+}
+
+PLACEHOLDER_FIELDS = ('image_width', 'image_height', 'image_blurhash')
+
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'AVIF': 'avif'}
+
+# Errors that mean the upload is not a usable image; retrying cannot help
+INVALID_IMAGE_ERRORS = (UnidentifiedImageError, Image.DecompressionBombError, OSError)
+
+
+def load_image(field_file):
+    """Decodes an uploaded image, upright and at most IMAGE_MAX_DIMENSION on its longest edge."""
+    limit = settings.IMAGE_MAX_DIMENSION
+    with field_file.open('rb') as f:
+        image = Image.open(f)
+        # Let the JPEG decoder downscale by a power of two while decoding
+        image.draft('RGB', (limit, limit))
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    image.thumbnail((limit, limit), Image.Resampling.LANCZOS)
+    return image
+
+
+def encode(image, format):
+    # A freshly encoded image carries no EXIF unless it is passed explicitly
+    buffer = io.BytesIO()
+    if format == 'JPEG':
+        image.convert('RGB').save(buffer, 'JPEG', quality=settings.IMAGE_QUALITY, optimize=True, progressive=True)
+    elif format == 'PNG':
+        image.save(buffer, 'PNG', optimize=True)
+    else:
+        image.save(buffer, format, quality=settings.IMAGE_QUALITY)
+    return buffer.getvalue()
+
+
+def render_variants(image):
+    """Returns {field name: encoded bytes} for every variant of `image`."""
+    format = settings.IMAGE_VARIANT_FORMAT
+    variants = {}
+    for field, size in VARIANTS.items():
+        variant = image.copy()
+        variant.thumbnail((size, size), Image.Resampling.LANCZOS)
+        variants[field] = encode(variant, format)
+    return variants
+
+
+def placeholder(image):
+    # More horizontal components for landscape images, more vertical for portrait
+    if image.width >= image.height:
+        return blurhash.encode(image, 4, 3)
+    return blurhash.encode(image, 3, 4)
+
+
+def process_image(instance):
+    """
+    Replaces `instance.image` with a stripped, size-capped copy and fills in its
+    variant and placeholder fields. The files are stored as content-addressed
+    blobs (see api.media), each with a reference taken for this instance, but
+    the instance is not saved. Returns the names of the files that were replaced.
+    """
+    image = load_image(instance.image)
+    # Keep PNG for transparency; everything else becomes a plain JPEG
+    format = 'PNG' if image.mode == 'RGBA' else 'JPEG'
+
+    replaced = media_names(instance)
+    instance.image = store_blob(encode(image, format), EXTENSIONS[format])
+    variant_ext = EXTENSIONS[settings.IMAGE_VARIANT_FORMAT]
+    for field, content in render_variants(image).items():
+        setattr(instance, field, store_blob(content, variant_ext))
+    instance.image_width, instance.image_height = image.size
+    instance.image_blurhash = placeholder(image)
+    return replaced
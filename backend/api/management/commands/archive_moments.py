@@ -0,0 +1,30 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from api.archive import archivable, archive_moments
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves moments with no activity for the retention horizon, with their recipients "
+        "and replies, to the archive tables in batched transactions. Runs nightly from "
+        "Celery beat; use this for a first backfill or a one-off run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--horizon-days', type=int, default=settings.ARCHIVE_HORIZON_DAYS,
+                            help='Archive moments quiet for this many days')
+        parser.add_argument('--batch-size', type=int, default=settings.ARCHIVE_BATCH_SIZE,
+                            help='Moments moved per transaction')
+        parser.add_argument('--max-batches', type=int, help='Stop after this many batches')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the moments that would move')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            cutoff = timezone.now() - timedelta(days=options['horizon_days'])
+            self.stdout.write(f"{archivable(cutoff).count()} moments quiet since {cutoff.isoformat()}")
+            return
+
+        moved = archive_moments(options['horizon_days'], options['batch_size'], options['max_batches'])
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} moments"))
@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import statistics
+import time
+from collections import defaultdict
+import httpx
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import RefreshToken
+from core.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammers the hot read endpoints with many simultaneous clients and reports "
+        "throughput and latency. Run it against a server started the way production "
+        "runs it (uvicorn pulse_backend.asgi:application), or in-process with --asgi."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://localhost:8000', help='Base URL of the running server')
+        parser.add_argument('--asgi', action='store_true', help='Call the ASGI application in-process instead of --url')
+        parser.add_argument('--clients', type=int, default=200, help='Simultaneous clients')
+        parser.add_argument('--requests', type=int, default=10, help='Requests per client')
+        parser.add_argument('--user', help='Username to authenticate as (default: a dedicated bench user)')
+        parser.add_argument(
+            '--paths', nargs='+',
+            default=['/api/activity/', '/api/moments/', '/api/users/search/?query=a'],
+            help='Endpoints to cycle through',
+        )
+
+    def handle(self, *args, **options):
+        base_url, transport, token = self.prepare(options)
+        latencies, errors, elapsed = asyncio.run(self.run(
+            base_url, transport, token, options['paths'], options['clients'], options['requests'],
+        ))
+
+        total = sum(len(values) for values in latencies.values()) + sum(errors.values())
+        self.stdout.write(
+            f"{options['clients']} clients, {total} requests in {elapsed:.2f}s: "
+            f"{total / elapsed:.1f} req/s, {sum(errors.values())} errors"
+        )
+        for path in options['paths']:
+            values = sorted(latencies[path])
+            if not values:
+                self.stdout.write(f"  {path}: no successful requests ({errors[path]} errors)")
+                continue
+            self.stdout.write(
+                f"  {path}: p50 {self.percentile(values, 50):.0f}ms  p95 {self.percentile(values, 95):.0f}ms  "
+                f"p99 {self.percentile(values, 99):.0f}ms  mean {statistics.mean(values):.0f}ms  errors {errors[path]}"
+            )
+
+    def prepare(self, options):
+        """Returns the base URL, httpx transport and access token the clients use."""
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['user']} does not exist")
+        else:
+            user, created = User.objects.get_or_create(username='bench', defaults={'email': 'bench@pulse.app'})
+            if created:
+                user.set_unusable_password()
+                user.save()
+        token = str(RefreshToken.for_user(user).access_token)
+        # httpx logs every request at INFO
+        logging.getLogger('httpx').setLevel(logging.WARNING)
+
+        if options['asgi']:
+            from pulse_backend.asgi import django_asgi_app
+            return 'http://localhost', httpx.ASGITransport(app=django_asgi_app), token
+        return options['url'], None, token
+
+    async def run(self, base_url, transport, token, paths, clients, requests):
+        latencies = defaultdict(list)
+        errors = defaultdict(int)
+        start = asyncio.Event()
+
+        async with httpx.AsyncClient(
+            base_url=base_url,
+            transport=transport,
+            headers={'Authorization': f'Bearer {token}'},
+            limits=httpx.Limits(max_connections=clients, max_keepalive_connections=clients),
+            timeout=60,
+        ) as client:
+            async def simulate(index):
+                await start.wait()
+                for n in range(requests):
+                    path = paths[(index + n) % len(paths)]
+                    began = time.perf_counter()
+                    try:
+                        response = await client.get(path)
+                        ok = response.status_code < 400
+                    except httpx.HTTPError:
+                        ok = False
+                    if ok:
+                        latencies[path].append((time.perf_counter() - began) * 1000)
+                    else:
+                        errors[path] += 1
+
+            tasks = [asyncio.create_task(simulate(i)) for i in range(clients)]
+            # Release every client at once so they really are simultaneous
+            began = time.perf_counter()
+            start.set()
+            await asyncio.gather(*tasks)
+            return latencies, errors, time.perf_counter() - began
+
+    @staticmethod
+    def percentile(sorted_values, pct):
+        index = min(len(sorted_values) - 1, round(pct / 100 * (len(sorted_values) - 1)))
+        return sorted_values[index]
@@ -0,0 +1,71 @@
+import asyncio
+import threading
+from contextlib import closing
+import psycopg2
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db import connections
+from .bench_concurrency import Command as ConcurrencyCommand
+
+
+class Command(ConcurrencyCommand):
+    help = (
+        "Load test for database connection pooling: runs the hot read endpoints at growing "
+        "numbers of simultaneous clients and samples pg_stat_activity meanwhile, reporting "
+        "how many Postgres connections the app holds at each level. With pooling the peak "
+        "stays at or below DATABASE_POOL_SIZE + DATABASE_POOL_MAX_OVERFLOW per process."
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--levels', type=int, nargs='+', default=[10, 50, 100, 200],
+                            help='Numbers of simultaneous clients to step through (overrides --clients)')
+        parser.add_argument('--interval', type=float, default=0.05, help='Seconds between connection samples')
+
+    def handle(self, *args, **options):
+        if connections['default'].vendor != 'postgresql':
+            raise CommandError('This load test reads pg_stat_activity and needs DATABASE_URL to point at PostgreSQL')
+
+        pool = settings.DATABASES['default'].get('POOL_OPTIONS')
+        if pool:
+            limit = pool['POOL_SIZE'] + pool['MAX_OVERFLOW']
+            self.stdout.write(f"Pooling on: at most {limit} connections per process")
+        else:
+            self.stdout.write(f"Pooling off: CONN_MAX_AGE={settings.DATABASES['default']['CONN_MAX_AGE']}")
+
+        base_url, transport, token = self.prepare(options)
+        # Sampled over a connection of its own, outside the pool and not counted
+        with closing(psycopg2.connect(**connections['default'].get_connection_params())) as sampler:
+            sampler.autocommit = True
+            self.stdout.write(f"{'clients':>8} {'req/s':>8} {'errors':>7} {'peak conns':>11} {'open after':>11}")
+            for clients in options['levels']:
+                samples = []
+                stop = threading.Event()
+                thread = threading.Thread(target=self.sample, args=(sampler, options['interval'], stop, samples))
+                thread.start()
+                try:
+                    latencies, errors, elapsed = asyncio.run(self.run(
+                        base_url, transport, token, options['paths'], clients, options['requests'],
+                    ))
+                finally:
+                    stop.set()
+                    thread.join()
+                total = sum(len(values) for values in latencies.values()) + sum(errors.values())
+                self.stdout.write(
+                    f"{clients:>8} {total / elapsed:>8.1f} {sum(errors.values()):>7} "
+                    f"{max(samples):>11} {self.count_connections(sampler):>11}"
+                )
+
+    def sample(self, sampler, interval, stop, samples):
+        samples.append(self.count_connections(sampler))
+        while not stop.wait(interval):
+            samples.append(self.count_connections(sampler))
+
+    @staticmethod
+    def count_connections(sampler):
+        with sampler.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*) FROM pg_stat_activity "
+                "WHERE datname = current_database() AND pid <> pg_backend_pid()"
+            )
+            return cursor.fetchone()[0]
@@ -0,0 +1,73 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from api.feeds import moments_feed
+from api.renderers import ORJSONRenderer
+from api.serializers import MomentSerializer
+from core.models import User, Moment, MomentRecipient, Reply
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the per-moment cost of building and rendering a feed page with "
+        "MomentSerializer + JSONRenderer against the flat values() path + ORJSONRenderer. "
+        "Sample data is created inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--moments', type=int, default=50, help='Moments per page')
+        parser.add_argument('--replies', type=int, default=5, help='Replies per moment')
+        parser.add_argument('--rounds', type=int, default=50, help='Timed rounds per variant')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                queryset = self.seed(options['moments'], options['replies'])
+                variants = {
+                    'MomentSerializer + JSONRenderer': lambda: JSONRenderer().render(
+                        MomentSerializer(MomentSerializer.setup_eager_loading(queryset), many=True).data
+                    ),
+                    'feeds.moments_feed + ORJSONRenderer': lambda: ORJSONRenderer().render(
+                        moments_feed(queryset)
+                    ),
+                }
+                results = {name: self.measure(render, options['rounds']) for name, render in variants.items()}
+                raise Rollback
+        except Rollback:
+            pass
+
+        baseline = None
+        for name, seconds in results.items():
+            per_item = seconds / options['moments'] * 1e6
+            baseline = baseline or per_item
+            self.stdout.write(
+                f"{name:40} {seconds * 1000:8.2f}ms/page  {per_item:8.1f}us/moment  {baseline / per_item:5.1f}x"
+            )
+
+    def seed(self, moments, replies):
+        sender = User.objects.create(username='bench_sender', email='sender@pulse.app')
+        receiver = User.objects.create(username='bench_receiver', email='receiver@pulse.app')
+        created = Moment.objects.bulk_create(
+            [Moment(sender=sender, text=f'Moment {i}', emoji='💓') for i in range(moments)]
+        )
+        MomentRecipient.objects.bulk_create([MomentRecipient(moment=m, receiver=receiver) for m in created])
+        Reply.objects.bulk_create([
+            Reply(parent_moment=m, sender=receiver, text=f'Reply {i}', emoji='✨')
+            for m in created for i in range(replies)
+        ])
+        return Moment.objects.filter(recipients__receiver=receiver).order_by('-created_at', '-id')
+
+    def measure(self, render, rounds):
+        # Warm up, then report the best round to keep scheduler noise out
+        render()
+        timings = []
+        for _ in range(rounds):
+            began = time.perf_counter()
+            render()
+            timings.append(time.perf_counter() - began)
+        return min(timings)
@@ -0,0 +1,149 @@
+"""
+Content-addressed media.
+
+Processed images are stored once under the SHA-256 of their bytes
+(blobs/ab/abcd....webp), so the same photo sent to many people or uploaded
+again costs no extra storage. A MediaBlob row counts the model fields that
+reference each blob; the file is deleted only when the last one lets go.
+Because a blob name never changes content, it can be cached forever.
+"""
+import hashlib
+import logging
+import re
+from collections import Counter
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from core.models import MediaBlob
+
+logger = logging.getLogger(__name__)
+
+BLOB_PREFIX = 'blobs/'
+
+CONTENT_TYPES = {
+    'jpg': 'image/jpeg',
+    'png': 'image/png',
+    'webp': 'image/webp',
+    'avif': 'image/avif',
+}
+
+BLOB_FILENAME = re.compile(r'^(?P<digest>[0-9a-f]{64})\.(?P<ext>' + '|'.join(CONTENT_TYPES) + r')$')
+
+# Blob names never change content
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Model fields holding media, processed or not
+MEDIA_FIELDS = ('image', 'image_thumbnail', 'image_medium')
+
+
+def blob_name(digest, ext):
+    return f"{BLOB_PREFIX}{digest[:2]}/{digest}.{ext}"
+
+
+def is_blob(name):
+    return name.startswith(BLOB_PREFIX)
+
+
+def store_blob(content, ext):
+    """Stores `content` (bytes) unless an identical blob exists, takes a reference to it and returns its name."""
+    digest = hashlib.sha256(content).hexdigest()
+    name = blob_name(digest, ext)
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                # Locked so a concurrent release cannot delete the file under us
+                blob = MediaBlob.objects.select_for_update().filter(digest=digest).first()
+                if blob is not None:
+                    MediaBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+                    return blob.name
+                if not default_storage.exists(name):
+                    saved = default_storage.save(name, ContentFile(content))
+                    if saved != name:
+                        # Lost a race to write the same bytes; theirs is identical
+                        default_storage.delete(saved)
+                MediaBlob.objects.create(digest=digest, name=name, size=len(content), ref_count=1)
+                return name
+        except IntegrityError:
+            # Another worker stored the same bytes first; take a reference to theirs
+            if attempt:
+                raise
+
+
+def media_names(instance):
+    return [getattr(instance, field).name for field in MEDIA_FIELDS if getattr(instance, field, None)]
+
+
+def discard_media(names):
+    """
+    Drops one reference for each name: blobs lose a reference and are deleted
+    with their last one, files that are not blobs (raw uploads) are deleted.
+    """
+    names = Counter(name for name in names if name)
+    for name in [name for name in names if not is_blob(name)]:
+        default_storage.delete(name)
+
+    blob_refs = {name: count for name, count in names.items() if is_blob(name)}
+    if not blob_refs:
+        return
+    with transaction.atomic():
+        unreferenced = []
+        for blob in MediaBlob.objects.select_for_update().filter(name__in=blob_refs):
+            blob.ref_count = max(0, blob.ref_count - blob_refs[blob.name])
+            if blob.ref_count:
+                blob.save(update_fields=['ref_count'])
+            else:
+                unreferenced.append(blob)
+        MediaBlob.objects.filter(pk__in=[blob.pk for blob in unreferenced]).delete()
+        for blob in unreferenced:
+            default_storage.delete(blob.name)
+            logger.info(f"Deleted unreferenced media blob {blob.name}")
+
+
+def discard_media_on_commit(names):
+    names = list(names)
+    if names:
+        transaction.on_commit(lambda: discard_media(names), robust=True)
+
+
+class UnsatisfiableRange(ValueError):
+    pass
+
+
+def parse_range(header, size):
+    """
+    Parses a single-range `Range: bytes=...` header into inclusive (start, end).
+    Returns None when the whole file should be sent (no header, or a form we
+    do not support such as multiple ranges).
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    start, _, end = header[len('bytes='):].strip().partition('-')
+    try:
+        if not start:
+            # Suffix range: the last N bytes
+            length = int(end)
+            if length <= 0:
+                raise UnsatisfiableRange(header)
+            return max(0, size - length), size - 1
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise UnsatisfiableRange(header)
+    return start, end
+
+
+def iter_range(f, start, end, chunk_size=64 * 1024):
+    try:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
@@ -0,0 +1,105 @@
+from urllib.parse import parse_qs
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from channels.db import database_sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError, AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from . import replicas
+from .authentication import CachedJWTAuthentication
+
+
+@database_sync_to_async
+def get_user_for_token(raw_token):
+    auth = CachedJWTAuthentication()
+    try:
+        validated_token = auth.get_validated_token(raw_token)
+        return auth.get_user(validated_token)
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return AnonymousUser()
+
+
+class JWTAuthMiddleware:
+    """
+    Authenticates WebSocket connections with the same access token the REST API
+    uses. Browsers cannot set headers on WebSocket handshakes, so the token is
+    read from the `token` query parameter, falling back to the Authorization header.
+    """
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        raw_token = self._get_raw_token(scope)
+        scope['user'] = await get_user_for_token(raw_token) if raw_token else AnonymousUser()
+        return await self.inner(scope, receive, send)
+
+    def _get_raw_token(self, scope):
+        query = parse_qs(scope.get('query_string', b'').decode())
+        if query.get('token'):
+            return query['token'][0]
+
+        headers = dict(scope.get('headers', []))
+        auth_header = headers.get(b'authorization', b'').decode().split()
+        if len(auth_header) == 2 and auth_header[0] == 'Bearer':
+            return auth_header[1]
+        return None
+
+
+class ReadReplicaMiddleware:
+    """
+    Sends the reads of safe requests to a replica (see api.replicas), unless
+    the user is pinned to the primary after a recent write of their own. The
+    user is taken from the access token alone, as DRF authenticates later.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = self.route(request)
+        try:
+            return self.get_response(request)
+        finally:
+            self.finish(request, token)
+
+    async def __acall__(self, request):
+        token = self.route(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            self.finish(request, token)
+
+    def route(self, request):
+        if not replicas.REPLICAS or request.method not in SAFE_METHODS:
+            return None
+        user_id = self._get_user_id(request)
+        if user_id is not None and replicas.is_pinned(user_id):
+            return None
+        return replicas.read_from_replica()
+
+    def finish(self, request, token):
+        if token is not None:
+            replicas.reset(token)
+        elif replicas.REPLICAS and request.method not in SAFE_METHODS:
+            user_id = self._get_user_id(request)
+            if user_id is not None:
+                replicas.pin_to_primary(user_id)
+
+    def _get_user_id(self, request):
+        auth = CachedJWTAuthentication()
+        header = auth.get_header(request)
+        raw_token = auth.get_raw_token(header) if header else None
+        if raw_token is None:
+            return None
+        try:
+            return auth.get_validated_token(raw_token).get(api_settings.USER_ID_CLAIM)
+        except (InvalidToken, TokenError):
+            return None
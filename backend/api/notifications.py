@@ -1,8 +1,11 @@
 import logging
 import firebase_admin
-from firebase_admin import credentials, messaging
+from firebase_admin import credentials, messaging, exceptions
 import os
+import uuid
 from django.conf import settings
+from django.core.cache import cache
+from core.models import DeviceToken
 
 logger = logging.getLogger(__name__)
 
@@ -21,31 +24,224 @@ try:
 except Exception as e:
     logger.error(f"Failed to initialize Firebase Admin SDK: {e}")
 
-def send_push_notification(user, title, body, data=None):
+# FCM accepts at most this many tokens per multicast request
+FCM_MULTICAST_LIMIT = 500
+
+# Errors meaning the token itself is dead. Captured at import time so the
+# checks still work when tests replace `messaging` with a mock.
+DEAD_TOKEN_ERRORS = (messaging.UnregisteredError, messaging.SenderIdMismatchError)
+INVALID_ARGUMENT_ERROR = exceptions.InvalidArgumentError
+
+def _batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def _send_batch(tokens, title, body, data, collapse_key=None):
+    """
+    Sends one multicast request. Returns (sent, dead_tokens, retry_tokens).
+    """
+    android = apns = None
+    if collapse_key:
+        # Devices replace any earlier notification carrying the same key
+        android = messaging.AndroidConfig(collapse_key=collapse_key)
+        apns = messaging.APNSConfig(headers={'apns-collapse-id': collapse_key})
+    message = messaging.MulticastMessage(
+        notification=messaging.Notification(
+            title=title,
+            body=body,
+        ),
+        data=data,
+        tokens=tokens,
+        android=android,
+        apns=apns,
+    )
+    try:
+        response = messaging.send_each_for_multicast(message)
+    except Exception as e:
+        logger.error(f"FCM multicast of {len(tokens)} tokens failed: {e}")
+        return 0, [], list(tokens)
+
+    dead, retry, invalid = [], [], []
+    for token, result in zip(tokens, response.responses):
+        if result.success:
+            continue
+        if isinstance(result.exception, DEAD_TOKEN_ERRORS):
+            dead.append(token)
+        elif isinstance(result.exception, INVALID_ARGUMENT_ERROR):
+            invalid.append(token)
+        else:
+            retry.append(token)
+
+    if invalid and len(invalid) == len(tokens):
+        # Every token rejected the same way: the payload is at fault, not the tokens
+        logger.error(f"FCM rejected multicast payload '{title}' as invalid")
+    else:
+        dead.extend(invalid)
+    return response.success_count, dead, retry
+
+def deliver_push(user_ids, title, body, data=None, tokens=None, collapse_key=None):
     """
-    Sends a push notification to a specific user via FCM.
+    Sends a push notification to every registered device of the given users,
+    fanned out through FCM multicast in batches of FCM_MULTICAST_LIMIT.
+    Tokens FCM reports as unregistered or invalid are deleted. Returns the
+    tokens that failed transiently, so the caller can retry just those; pass
+    them back as `tokens` to skip the lookup.
     """
-    if not user.fcm_token:
-        logger.info(f"No FCM token found for user {user.username}. Skipping push.")
-        return False
+    if tokens is None:
+        tokens = list(DeviceToken.objects.filter(user_id__in=user_ids).values_list('token', flat=True))
+    if not tokens:
+        logger.info(f"No devices registered for users {list(user_ids)}. Skipping push.")
+        return []
 
     if not firebase_initialized:
-        logger.info(f"[MOCK PUSH] To: {user.username} | Title: {title} | Body: {body}")
+        logger.info(f"[MOCK PUSH] To: {len(tokens)} devices | Title: {title} | Body: {body}")
         # In mock mode, we just log it. In production, this would send a real FCM message.
-        return True
+        return []
+
+    # FCM data payloads only carry string values
+    data = {key: str(value) for key, value in (data or {}).items()}
+    sent, dead, retry = 0, [], []
+    for batch in _batches(tokens, FCM_MULTICAST_LIMIT):
+        batch_sent, batch_dead, batch_retry = _send_batch(batch, title, body, data, collapse_key)
+        sent += batch_sent
+        dead.extend(batch_dead)
+        retry.extend(batch_retry)
+
+    if dead:
+        DeviceToken.objects.filter(token__in=dead).delete()
+        logger.info(f"Pruned {len(dead)} dead FCM tokens.")
+    logger.info(f"Sent '{title}' to {sent}/{len(tokens)} devices.")
+    return retry
+
+# Push types that are coalesced per recipient, with the collapsed wording
+COALESCED_PUSH = {
+    'moment': ("Pulses 💓", "{actors} sent you {count} pulses."),
+    'reply': ("New Replies ✨", "{actors} sent you {count} replies."),
+    'connection_request': ("New Circle Requests 💓", "{actors} want to join your circle!"),
+}
+
+# Added to a window's joiner count when it is flushed: any later increment lands
+# past it, telling the notification it arrived too late for that window
+SEALED = 1 << 40
+# Left in a slot the flush found empty, so its notification moves to the next window
+MISSED = 'missed'
+
+def _window_timeout():
+    # Outlives the window so a lost flush cannot hold the window open forever
+    return settings.PUSH_COALESCE_WINDOW_SECONDS * 2 + 60
+
+def _window_key(user_id, kind):
+    return f"push:window:{user_id}:{kind}"
+
+def _count_key(user_id, kind, window):
+    return f"{_window_key(user_id, kind)}:{window}:count"
 
+def _slot_key(user_id, kind, window, index):
+    return f"{_window_key(user_id, kind)}:{window}:{index}"
+
+def _take_number(key, delta, timeout):
+    """Atomically adds `delta` to the counter at `key`, starting it if missing; returns the new value."""
     try:
-        message = messaging.Message(
-            notification=messaging.Notification(
-                title=title,
-                body=body,
-            ),
-            data=data or {},
-            token=user.fcm_token,
-        )
-        response = messaging.send(message)
-        logger.info(f"Successfully sent message to {user.username}: {response}")
-        return True
-    except Exception as e:
-        logger.error(f"Error sending FCM message to {user.username}: {e}")
-        return False
+        return cache.incr(key, delta)
+    except ValueError:
+        if cache.add(key, delta, timeout):
+            return delta
+        return cache.incr(key, delta)
+
+def open_push_window(user_id, kind, actor_id, data):
+    """
+    Counts one notification into the recipient's coalescing window for `kind`.
+    Returns the new window's id if it opened one, in which case it should be
+    sent right away and the window flushed with close_push_window later;
+    otherwise None, and it goes out as part of a single collapsed notification
+    when the window is flushed.
+
+    Each window is versioned by its id. The notification that opens it keeps
+    slot 0; later ones take a number from an atomic counter and write their
+    actor and data to a slot of their own, so none overwrites another.
+    """
+    window_key = _window_key(user_id, kind)
+    timeout = _window_timeout()
+
+    for _ in range(3):
+        window = uuid.uuid4().hex
+        if cache.add(window_key, window, timeout):
+            cache.set(_slot_key(user_id, kind, window, 0), (actor_id, data), timeout)
+            return window
+
+        window = cache.get(window_key)
+        if window is None:
+            # Flushed in the meantime: try opening a new one
+            continue
+        try:
+            index = _take_number(_count_key(user_id, kind, window), 1, timeout)
+        except ValueError:
+            continue
+        if index > SEALED:
+            continue
+        if cache.add(_slot_key(user_id, kind, window, index), (actor_id, data), timeout):
+            return None
+        # The flush got to the slot first and left this one out: carry on into the next window
+
+    # The window keeps changing under us: send this one on its own rather than
+    # lose it. Its window was never opened, so flushing it finds nothing to add.
+    return uuid.uuid4().hex
+
+def close_push_window(user_id, kind, window=None):
+    """
+    Ends the window and returns (count, actor_ids, latest_data), the count
+    including the notification that opened it. A notification racing with
+    this either makes it into the returned count or opens the next window;
+    none is dropped in between.
+    """
+    window_key = _window_key(user_id, kind)
+    if window is None:
+        window = cache.get(window_key)
+        if window is None:
+            return 0, [], {}
+    if cache.get(window_key) == window:
+        # New notifications open the next window from here on
+        cache.delete(window_key)
+    try:
+        # The sealed counter is left to expire, so late increments keep finding it
+        joined = _take_number(_count_key(user_id, kind, window), SEALED, _window_timeout()) - SEALED
+    except ValueError:
+        return 0, [], {}
+    if joined >= SEALED:
+        # Already flushed
+        return 0, [], {}
+
+    slot_keys = [_slot_key(user_id, kind, window, index) for index in range(joined + 1)]
+    slots = cache.get_many(slot_keys)
+    for key in slot_keys[1:]:
+        if key in slots:
+            continue
+        # Numbered but not written yet. Claiming the slot sends that notification
+        # on to the next window; if it was written in the meantime, take it now.
+        if cache.add(key, MISSED, _window_timeout()):
+            joined -= 1
+        else:
+            slots[key] = cache.get(key)
+    # Claimed slots stay behind until they expire, so they cannot be written any more
+    cache.delete_many([key for key in slot_keys if key in slots])
+
+    actor_ids, data = [], {}
+    for key in slot_keys:
+        if slots.get(key) is None:
+            continue
+        actor_id, data = slots[key]
+        if actor_id not in actor_ids:
+            actor_ids.append(actor_id)
+    return joined + 1, actor_ids, data or {}
+
+def _join_names(names):
+    if len(names) == 1:
+        return names[0]
+    if len(names) == 2:
+        return f"{names[0]} and {names[1]}"
+    return f"{names[0]}, {names[1]} and {len(names) - 2} others"
+
+def coalesced_message(kind, count, actor_names):
+    title, body = COALESCED_PUSH[kind]
+    actors = _join_names(actor_names) if actor_names else "Your circle"
+    return title, body.format(actors=actors, count=count)
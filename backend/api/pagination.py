@@ -0,0 +1,136 @@
+import base64
+import json
+from datetime import datetime
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import ParseError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+OLDER = 'older'
+NEWER = 'newer'
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset pagination on (created_at, id).
+
+    Pages are fetched with a range predicate on the composite key instead of an
+    OFFSET, so the cost of a page does not depend on how deep into the history
+    it is. The response body stays a plain list for existing clients; cursors
+    travel in the X-Cursor-Older / X-Cursor-Newer headers and are passed back
+    as `?cursor=`. Without a cursor the newest page is returned.
+    """
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    # Feeds list newest first; conversations flip this to read top-down
+    ascending = False
+
+    def __init__(self, ascending=None):
+        if ascending is not None:
+            self.ascending = ascending
+        self.page_size = settings.KEYSET_PAGE_SIZE
+        self.max_page_size = settings.KEYSET_MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.build_page(list(self.page_queryset(queryset, request)), request)
+
+    def page_queryset(self, queryset, request):
+        self.page_size = self.get_page_size(request)
+        self.direction, self.position = self.decode_cursor(request.query_params.get(self.cursor_query_param))
+        position = self.position
+
+        if self.direction == NEWER:
+            created_at, pk = position
+            queryset = queryset.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+            ).order_by('created_at', 'id')
+        else:
+            if position:
+                created_at, pk = position
+                queryset = queryset.filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+                )
+            queryset = queryset.order_by('-created_at', '-id')
+        # One extra row tells us whether there is another page
+        return queryset[:self.page_size + 1]
+
+    def reaches_before(self, rows, boundary):
+        """
+        Whether the page started by `rows` (as fetched from page_queryset) may
+        also hold rows created at or before `boundary`, which are missing
+        from the fetched queryset (see merge_rows).
+        """
+        if boundary is None:
+            return False
+        if self.direction == NEWER:
+            return self.position[0] <= boundary
+        return len(rows) <= self.page_size or self._key(rows[-1])[0] <= boundary
+
+    def merge_rows(self, rows, more):
+        """Merges rows fetched from two page_queryset calls into one fetch's worth."""
+        merged = sorted([*rows, *more], key=self._key, reverse=self.direction != NEWER)
+        return merged[:self.page_size + 1]
+
+    def build_page(self, rows, request):
+        """Finishes a page from the fetched rows: instances or values() dicts."""
+        direction = self.direction
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if direction == NEWER:
+            rows.reverse()
+
+        # rows are newest first from here on
+        self.older_cursor = None
+        self.newer_cursor = None
+        if rows:
+            if has_more or direction == NEWER:
+                self.older_cursor = self.encode_cursor(OLDER, rows[-1])
+            self.newer_cursor = self.encode_cursor(NEWER, rows[0])
+        elif direction == NEWER:
+            # Nothing new yet: hand the same position back for the next poll
+            self.newer_cursor = request.query_params.get(self.cursor_query_param)
+
+        if self.ascending:
+            rows.reverse()
+        return rows
+
+    def get_paginated_response(self, data):
+        response = Response(data)
+        if self.older_cursor:
+            response['X-Cursor-Older'] = self.older_cursor
+        if self.newer_cursor:
+            response['X-Cursor-Newer'] = self.newer_cursor
+        return response
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    @staticmethod
+    def _key(obj):
+        if isinstance(obj, dict):
+            return obj['created_at'], obj['id']
+        return obj.created_at, obj.id
+
+    def encode_cursor(self, direction, obj):
+        created_at, pk = self._key(obj)
+        payload = json.dumps({'d': direction, 't': created_at.isoformat(), 'id': pk})
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return OLDER, None
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            direction = payload['d']
+            position = (datetime.fromisoformat(payload['t']), int(payload['id']))
+        except (ValueError, KeyError, TypeError):
+            raise ParseError({'error': 'Invalid cursor'})
+        if direction not in (OLDER, NEWER):
+            raise ParseError({'error': 'Invalid cursor'})
+        return direction, position
@@ -0,0 +1,87 @@
+"""
+Cached public profiles.
+
+The part of a public profile that is the same for every viewer (username,
+emoji and photos) is cached under a per-user version number, bumped whenever
+the user or one of their photos changes (see api.signals). The viewer's
+connection status is never cached with it; it is overlaid per request from
+the graph cache, falling back to a single lookup on the connection pair.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from core.models import Connection, User
+from . import graph
+from .versioning import bump_version, current_version
+from .serializers import UserProfilePhotoSerializer
+
+PHOTO_URL_FIELDS = ('image', 'image_thumbnail', 'image_medium')
+
+
+def _version_key(user_id):
+    return f"profile:version:{user_id}"
+
+
+def _data_key(user_id, version):
+    return f"profile:data:{user_id}:{version}"
+
+
+def _load_profile(user_id):
+    # From the primary: a lagging replica's answer would be cached as current
+    user = User.objects.using(DEFAULT_DB_ALIAS).filter(pk=user_id).prefetch_related('profile_photos').first()
+    if user is None:
+        return None
+    # Serialized without a request, so photo URLs are stored as the storage returns them
+    photos = UserProfilePhotoSerializer(user.profile_photos.all(), many=True).data
+    return {
+        'id': user.id,
+        'username': user.username,
+        'avatar_emoji': user.avatar_emoji,
+        'profile_photos': [dict(photo) for photo in photos],
+    }
+
+
+def cached_profile(user_id):
+    """The viewer-independent part of `user_id`'s public profile, or None if there is no such user."""
+    key = _data_key(user_id, current_version(_version_key(user_id)))
+    profile = cache.get(key)
+    if profile is None:
+        profile = _load_profile(user_id)
+        if profile is not None:
+            cache.set(key, profile, settings.PROFILE_CACHE_TIMEOUT)
+    return profile
+
+
+def connection_status(viewer, user_id):
+    if not viewer.is_authenticated:
+        return 'NONE'
+    if graph.is_connected(viewer, user_id):
+        return 'ACCEPTED'
+    status = Connection.objects.between(viewer, user_id).values_list('status', flat=True).first()
+    return status or 'NONE'
+
+
+def public_profile(request, user_id):
+    """
+    The same payload PublicUserSerializer builds for `user_id` in the context
+    of `request`, or None if there is no such user.
+    """
+    profile = cached_profile(user_id)
+    if profile is None:
+        return None
+    photos = [
+        {**photo, **{field: request.build_absolute_uri(photo[field]) for field in PHOTO_URL_FIELDS if photo[field]}}
+        for photo in profile['profile_photos']
+    ]
+    return {
+        'id': profile['id'],
+        'username': profile['username'],
+        'avatar_emoji': profile['avatar_emoji'],
+        'connection_status': connection_status(request.user, user_id),
+        'profile_photos': photos,
+    }
+
+
+def invalidate(*user_ids):
+    for user_id in user_ids:
+        bump_version(_version_key(user_id))
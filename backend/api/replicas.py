@@ -0,0 +1,60 @@
+"""
+Read replicas.
+
+Safe requests (GET, HEAD, OPTIONS) read from one of the DATABASE_REPLICA_URL
+databases, picked once per request by ReadReplicaMiddleware. Writes, queries
+inside a transaction, and everything outside such a request (Celery tasks,
+WebSocket consumers, management commands) use the primary.
+
+Replicas lag behind the primary, so a user who just wrote something could
+read the old state back. After any unsafe request the user is pinned to the
+primary for DATABASE_REPLICA_PIN_SECONDS. Reads that fill the shared caches
+(api.graph, api.profiles) always use the primary, since whatever they load
+is served to every user until the next invalidation.
+"""
+import random
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICAS = [alias for alias in settings.DATABASES if alias.startswith('replica_')]
+
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def _pin_key(user_id):
+    return f"replicas:pin:{user_id}"
+
+
+def pin_to_primary(user_id):
+    cache.set(_pin_key(user_id), True, settings.DATABASE_REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user_id):
+    return cache.get(_pin_key(user_id)) is not None
+
+
+def read_from_replica():
+    """Routes reads in the current context to a replica; returns a token for `reset`."""
+    return _read_alias.set(random.choice(REPLICAS))
+
+
+def reset(token):
+    _read_alias.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        # Explicitly, or instances read from a replica would be saved back to it
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
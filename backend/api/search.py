@@ -0,0 +1,103 @@
+"""
+User search.
+
+Candidates are found through indexes only: the unique invite_id index, a
+prefix index on username and a substring index (pg_trgm GIN on Postgres, an
+FTS5 trigram table on SQLite; see core migration 0006). The candidate list
+depends only on the query, so it is cached briefly for hot prefixes while a
+user types; ranking by mutual connections is applied per viewer on top.
+"""
+import hashlib
+import logging
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections, router
+from core.models import User
+from . import graph
+
+logger = logging.getLogger(__name__)
+
+TIER_INVITE_ID = 0
+TIER_PREFIX = 1
+TIER_SUBSTRING = 2
+
+# Trigram indexes cannot serve patterns shorter than this
+MIN_SUBSTRING_LENGTH = 3
+
+SQLITE_FTS_TABLE = 'core_user_search'
+
+
+def _prefix_matches(query, limit):
+    return list(
+        User.objects.filter(username__istartswith=query)
+        .order_by('username').values_list('id', 'username')[:limit]
+    )
+
+
+def _substring_matches(query, limit):
+    # Raw SQL skips the router, so pick the read database the way a queryset would
+    connection = connections[router.db_for_read(User)]
+    if connection.vendor == 'sqlite':
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT rowid, username FROM {SQLITE_FTS_TABLE} WHERE {SQLITE_FTS_TABLE} MATCH %s LIMIT %s",
+                    ['"' + query.replace('"', '""') + '"', limit],
+                )
+                return cursor.fetchall()
+        except DatabaseError as e:
+            # SQLite built without the trigram tokenizer: fall through to a scan
+            logger.warning(f"User search FTS table unavailable: {e}")
+    return list(User.objects.filter(username__icontains=query).values_list('id', 'username')[:limit])
+
+
+def find_candidates(query):
+    """
+    Returns up to SEARCH_CANDIDATE_LIMIT (id, username, tier) tuples for `query`,
+    independent of who is searching.
+    """
+    limit = settings.SEARCH_CANDIDATE_LIMIT
+    candidates = {}
+
+    # Invite ids are generated upper-case, so an equality probe hits the unique index
+    for user_id, username in User.objects.filter(invite_id=query.upper()).values_list('id', 'username')[:1]:
+        candidates[user_id] = (user_id, username, TIER_INVITE_ID)
+
+    for user_id, username in _prefix_matches(query, limit):
+        candidates.setdefault(user_id, (user_id, username, TIER_PREFIX))
+
+    if len(query) >= MIN_SUBSTRING_LENGTH and len(candidates) < limit:
+        for user_id, username in _substring_matches(query, limit):
+            tier = TIER_PREFIX if username.lower().startswith(query.lower()) else TIER_SUBSTRING
+            candidates.setdefault(user_id, (user_id, username, tier))
+
+    return list(candidates.values())[:limit]
+
+
+def cached_candidates(query):
+    key = 'search:candidates:' + hashlib.sha1(query.lower().encode()).hexdigest()
+    candidates = cache.get(key)
+    if candidates is None:
+        candidates = find_candidates(query)
+        cache.set(key, candidates, settings.SEARCH_CACHE_TIMEOUT)
+    return candidates
+
+
+def search_users(viewer, query, limit=None, queryset=None):
+    """
+    Ranked search results for `viewer`: exact invite id first, then username
+    prefix matches, then substring matches; ties go to the user with more
+    mutual connections, then the shorter username.
+    """
+    query = query.strip()
+    if not query:
+        return []
+    limit = max(1, min(limit or settings.SEARCH_RESULT_LIMIT, settings.SEARCH_MAX_RESULT_LIMIT))
+
+    candidates = [c for c in cached_candidates(query) if c[0] != viewer.id]
+    mutuals = graph.mutual_counts(viewer, [c[0] for c in candidates])
+    candidates.sort(key=lambda c: (c[2], -mutuals.get(c[0], 0), len(c[1]), c[1].lower()))
+    ranked_ids = [c[0] for c in candidates[:limit]]
+
+    users = (queryset if queryset is not None else User.objects.all()).in_bulk(ranked_ids)
+    return [users[user_id] for user_id in ranked_ids if user_id in users]
@@ -1,6 +1,9 @@
 from rest_framework import serializers
-from django.db.models import Q
+from django.conf import settings
+from django.db.models import Count, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
 from core.models import User, Connection, Moment, Reply, UserProfilePhoto
+from .feeds import visible_replies
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -17,10 +20,30 @@ class UserSerializer(serializers.ModelSerializer):
         )
         return user
 
+class NestedUserSerializer(serializers.ModelSerializer):
+    # Users embedded in connections, moments and replies; these reach people
+    # who are not connected to them, so unlike UserSerializer there is no email
+    class Meta:
+        model = User
+        fields = ('id', 'username', 'avatar_emoji', 'invite_id')
+        read_only_fields = fields
+
 class UserProfilePhotoSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserProfilePhoto
-        fields = ('id', 'image', 'order')
+        fields = (
+            'id', 'image', 'image_thumbnail', 'image_medium',
+            'image_width', 'image_height', 'image_blurhash', 'order',
+        )
+
+class PublicUserListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        users = list(data.all() if hasattr(data, 'all') else data)
+        request = self.context.get('request')
+        if 'connection_statuses' not in self.context and request and request.user.is_authenticated:
+            # Resolve the viewer's status with the whole page in one query
+            self.context['connection_statuses'] = Connection.objects.statuses_for(request.user, users)
+        return super().to_representation(users)
 
 class PublicUserSerializer(serializers.ModelSerializer):
     connection_status = serializers.SerializerMethodField()
@@ -29,40 +52,94 @@ class PublicUserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ('id', 'username', 'avatar_emoji', 'connection_status', 'profile_photos')
+        list_serializer_class = PublicUserListSerializer
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.prefetch_related('profile_photos')
 
     def get_connection_status(self, obj):
         request = self.context.get('request')
         if not request or not request.user.is_authenticated:
             return 'NONE'
-        
-        connection = Connection.objects.filter(
-            (Q(requester=request.user) & Q(receiver=obj)) | 
-            (Q(requester=obj) & Q(receiver=request.user))
-        ).first()
+
+        statuses = self.context.get('connection_statuses')
+        if statuses is not None:
+            return statuses.get(obj.id, 'NONE')
+
+        connection = Connection.objects.between(request.user, obj).first()
 
         if not connection:
             return 'NONE'
         return connection.status
 
 class ConnectionSerializer(serializers.ModelSerializer):
-    requester = UserSerializer(read_only=True)
-    receiver = UserSerializer(read_only=True)
+    requester = NestedUserSerializer(read_only=True)
+    receiver = NestedUserSerializer(read_only=True)
 
     class Meta:
         model = Connection
-        fields = '__all__'
+        # Not '__all__': low_user/high_user are internal to the pair index
+        fields = ('id', 'requester', 'receiver', 'status', 'created_at', 'updated_at')
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('requester', 'receiver')
 
 class ReplySerializer(serializers.ModelSerializer):
-    sender = UserSerializer(read_only=True)
+    sender = NestedUserSerializer(read_only=True)
 
     class Meta:
         model = Reply
         fields = '__all__'
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('sender')
+
 class MomentSerializer(serializers.ModelSerializer):
-    sender = UserSerializer(read_only=True)
-    replies = ReplySerializer(many=True, read_only=True)
+    sender = NestedUserSerializer(read_only=True)
+    replies = serializers.SerializerMethodField()
+    reply_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Moment
-        fields = ('id', 'sender', 'text', 'emoji', 'image', 'created_at', 'replies')
+        fields = (
+            'id', 'sender', 'text', 'emoji', 'image', 'image_thumbnail', 'image_medium',
+            'image_width', 'image_height', 'image_blurhash', 'created_at', 'replies', 'reply_count',
+        )
+
+    @staticmethod
+    def setup_eager_loading(queryset, viewer_id=None):
+        # Only the latest FEED_REPLY_LIMIT replies are loaded per moment so a
+        # single busy thread cannot blow up a feed page; reply_count has the total.
+        # Both count only the replies `viewer_id` may see, if given.
+        replies = Reply.objects.filter(visible_replies(viewer_id)) if viewer_id is not None else Reply.objects
+        latest_replies = replies.select_related('sender').order_by('-created_at', '-id')
+        reply_count = (
+            replies.filter(parent_moment=OuterRef('pk'))
+            .order_by().values('parent_moment').annotate(total=Count('id')).values('total')
+        )
+        return queryset.select_related('sender').prefetch_related(
+            Prefetch('replies', queryset=latest_replies[:settings.FEED_REPLY_LIMIT], to_attr='latest_replies')
+        ).annotate(reply_count=Coalesce(Subquery(reply_count), 0))
+
+    def visible_replies(self, obj):
+        request = self.context.get('request')
+        if request is None:
+            return obj.replies.all()
+        return obj.replies.filter(visible_replies(request.user.pk))
+
+    def get_replies(self, obj):
+        if hasattr(obj, 'latest_replies'):
+            replies = obj.latest_replies
+        else:
+            replies = self.visible_replies(obj).select_related('sender').order_by('-created_at', '-id')[:settings.FEED_REPLY_LIMIT]
+        # Oldest first, as the thread is displayed
+        replies = sorted(replies, key=lambda r: (r.created_at, r.id))
+        return ReplySerializer(replies, many=True, context=self.context).data
+
+    def get_reply_count(self, obj):
+        if hasattr(obj, 'reply_count'):
+            return obj.reply_count
+        return self.visible_replies(obj).count()
@@ -0,0 +1,43 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from core.models import ArchivedMoment, Connection, Moment, UnreadCounter, User, UserProfilePhoto
+from . import graph, profiles
+from .authentication import invalidate_user
+from .media import discard_media_on_commit, media_names
+
+
+@receiver(post_save, sender=Connection)
+@receiver(post_delete, sender=Connection)
+def invalidate_connection_graph(sender, instance, **kwargs):
+    # After commit, so no other request can re-cache the pre-change state
+    transaction.on_commit(lambda: graph.invalidate(instance.requester_id, instance.receiver_id))
+
+
+@receiver(post_delete, sender=Moment)
+@receiver(post_delete, sender=ArchivedMoment)
+@receiver(post_delete, sender=UserProfilePhoto)
+def release_media(sender, instance, **kwargs):
+    discard_media_on_commit(media_names(instance))
+
+
+@receiver(post_save, sender=UserProfilePhoto)
+@receiver(post_delete, sender=UserProfilePhoto)
+def invalidate_profile_photos(sender, instance, **kwargs):
+    transaction.on_commit(lambda: profiles.invalidate(instance.user_id))
+
+
+@receiver(post_save, sender=User)
+def create_unread_counter(sender, instance, created, raw=False, **kwargs):
+    # With the user, so increments always have a row to land on (see api.counters)
+    if created and not raw:
+        UnreadCounter.objects.create(user=instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+    profiles.invalidate(instance.pk)
+    # Again after commit, in case a request cached the old row in between
+    transaction.on_commit(lambda: (invalidate_user(instance.pk), profiles.invalidate(instance.pk)))
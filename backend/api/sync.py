@@ -0,0 +1,116 @@
+import base64
+import json
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from core.models import Connection, Moment, Reply, MomentRecipient
+from .feeds import visible_replies
+from .serializers import ConnectionSerializer, MomentSerializer, ReplySerializer
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+TABLES = ('moments', 'replies', 'receipts', 'connections')
+
+
+def encode_cursor(positions):
+    payload = {
+        table: [since.isoformat(), pk] for table, (since, pk) in positions.items()
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+def _position(value):
+    since, pk = value
+    since = datetime.fromisoformat(since)
+    if timezone.is_naive(since) or not (pk is None or type(pk) is int):
+        raise ValueError(value)
+    return since, pk
+
+
+def decode_cursor(cursor):
+    """The (updated_at, id) position of each table, from a cursor; id is None to resend that instant."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if 't' in payload:
+            # Cursors from before positions were kept per table
+            return dict.fromkeys(TABLES, _position([payload['t'], None]))
+        return {table: _position(payload[table]) for table in TABLES}
+    except (ValueError, KeyError, TypeError, AttributeError):
+        raise InvalidCursor(cursor)
+
+
+def _changed(queryset, position, limit):
+    if position is not None:
+        since, pk = position
+        if pk is None:
+            queryset = queryset.filter(updated_at__gte=since)
+        else:
+            queryset = queryset.filter(Q(updated_at__gt=since) | Q(updated_at=since, id__gt=pk))
+    rows = list(queryset.order_by('updated_at', 'id')[:limit + 1])
+    return rows[:limit], len(rows) > limit
+
+
+def collect_changes(user, positions, limit=None):
+    """
+    Returns every moment, reply, read receipt and connection visible to `user`
+    that changed after `positions` (as decoded from a cursor), the cursor for
+    the next call, and whether there is more to fetch right away.
+
+    Each table keeps its own position in the cursor. While a table has more
+    to send, its position is the (updated_at, id) of the last row sent, so
+    every page makes progress however many rows share a timestamp. Once a
+    table is drained its position rewinds by SYNC_CURSOR_OVERLAP_SECONDS so
+    rows committed by slower concurrent transactions are not skipped;
+    clients upsert by id, so re-delivered rows are harmless.
+    """
+    positions = positions or {}
+    limit = limit or settings.SYNC_PAGE_SIZE
+    now = timezone.now()
+
+    my_moments = Q(sender=user) | Q(recipients__receiver=user)
+    changes = {
+        'moments': _changed(
+            MomentSerializer.setup_eager_loading(Moment.objects.filter(my_moments).distinct(), user.pk),
+            positions.get('moments'), limit,
+        ),
+        'replies': _changed(
+            ReplySerializer.setup_eager_loading(Reply.objects.filter(
+                Q(sender=user) | Q(parent_moment__sender=user) | Q(parent_moment__recipients__receiver=user),
+                visible_replies(user.pk),
+            ).distinct()),
+            positions.get('replies'), limit,
+        ),
+        'receipts': _changed(
+            MomentRecipient.objects.filter(Q(receiver=user) | Q(moment__sender=user)),
+            positions.get('receipts'), limit,
+        ),
+        'connections': _changed(
+            ConnectionSerializer.setup_eager_loading(
+                Connection.objects.filter(Q(requester=user) | Q(receiver=user))
+            ),
+            positions.get('connections'), limit,
+        ),
+    }
+
+    rewind = now - timedelta(seconds=settings.SYNC_CURSOR_OVERLAP_SECONDS)
+    next_positions = {}
+    for table, (rows, has_more) in changes.items():
+        position = positions.get(table)
+        if has_more:
+            next_positions[table] = (rows[-1].updated_at, rows[-1].id)
+        elif position is not None and position[0] >= rewind:
+            # Never rewind into rows this client has already paged through
+            next_positions[table] = position
+        else:
+            next_positions[table] = (rewind, None)
+
+    rows = {table: value[0] for table, value in changes.items()}
+    has_more = any(value[1] for value in changes.values())
+    return rows, encode_cursor(next_positions), has_more
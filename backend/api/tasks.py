@@ -0,0 +1,165 @@
+import logging
+from celery import shared_task
+from celery.utils.time import get_exponential_backoff_interval
+from django.apps import apps
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+from core.models import User, UserProfilePhoto
+from .archive import archive_moments
+from .images import VARIANTS, PLACEHOLDER_FIELDS, INVALID_IMAGE_ERRORS, process_image
+from .media import discard_media, media_names
+from . import profiles
+from .notifications import (
+    COALESCED_PUSH, deliver_push, open_push_window, close_push_window, coalesced_message
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _retry_countdown(retries):
+    # Failures are usually transient: back off exponentially, with jitter
+    return get_exponential_backoff_interval(factor=1, retries=retries, maximum=600, full_jitter=True)
+
+
+@shared_task(bind=True, max_retries=5)
+def send_email_task(self, subject, message, recipient_list):
+    # One message per recipient, so broadcast recipients never see each other's
+    # addresses, all sent over a single SMTP connection
+    recipients = [recipient for recipient in recipient_list if recipient]
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        logger.warning(f"Could not connect to send '{subject}': {e}")
+        raise self.retry(args=(subject, message, recipients), countdown=_retry_countdown(self.request.retries))
+
+    failed = []
+    try:
+        for recipient in recipients:
+            try:
+                EmailMessage(subject, message, settings.DEFAULT_FROM_EMAIL, [recipient], connection=connection).send()
+            except Exception as e:
+                logger.warning(f"Email '{subject}' to {recipient} failed: {e}")
+                failed.append(recipient)
+    finally:
+        connection.close()
+    if failed:
+        # Retry only the recipients that did not get it, so nobody gets the email twice
+        raise self.retry(args=(subject, message, failed), countdown=_retry_countdown(self.request.retries))
+
+
+@shared_task(bind=True, max_retries=5)
+def send_push_task(self, user_ids, title, body, data=None, tokens=None, collapse_key=None):
+    retry_tokens = deliver_push(user_ids, title, body, data, tokens=tokens, collapse_key=collapse_key)
+    if retry_tokens:
+        # Retry only the devices that failed, so nobody gets the push twice
+        raise self.retry(
+            args=(user_ids, title, body, data),
+            kwargs={'tokens': retry_tokens, 'collapse_key': collapse_key},
+            countdown=_retry_countdown(self.request.retries),
+        )
+
+
+@shared_task
+def coalesce_push_task(user_ids, title, body, data):
+    """
+    Sends the first notification of each recipient's window straight away and
+    schedules a flush; the rest are absorbed into that window.
+    """
+    kind = data['type']
+    windows = {user_id: open_push_window(user_id, kind, data.get('sender_id'), data) for user_id in user_ids}
+    leading = [user_id for user_id, window in windows.items() if window]
+    if not leading:
+        return
+
+    send_push_task.delay(leading, title, body, data, collapse_key=kind)
+    for user_id in leading:
+        flush_push_window_task.apply_async(
+            (user_id, kind, windows[user_id]), countdown=settings.PUSH_COALESCE_WINDOW_SECONDS,
+        )
+
+
+@shared_task
+def flush_push_window_task(user_id, kind, window=None):
+    count, actor_ids, data = close_push_window(user_id, kind, window)
+    if count < 2:
+        # Only the leading notification arrived, and it has already been sent
+        return
+
+    names = dict(User.objects.filter(id__in=actor_ids).values_list('id', 'username'))
+    actor_names = [names[int(actor_id)] for actor_id in actor_ids if actor_id and int(actor_id) in names]
+    title, body = coalesced_message(kind, count, actor_names)
+    # Same collapse key as the leading notification, which this one replaces on the device
+    send_push_task.delay([user_id], title, body, {**data, 'count': str(count)}, collapse_key=kind)
+
+
+@shared_task
+def process_image_task(model_label, pk, name):
+    model = apps.get_model(model_label)
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None or instance.image.name != name:
+        # Deleted, or replaced by a newer upload that has its own task
+        return
+
+    try:
+        replaced = process_image(instance)
+    except INVALID_IMAGE_ERRORS as e:
+        logger.warning(f"Could not process image {name} of {model_label} {pk}: {e}")
+        return
+
+    fields = {'image': instance.image.name}
+    fields.update({field: getattr(instance, field).name for field in VARIANTS})
+    fields.update({field: getattr(instance, field) for field in PLACEHOLDER_FIELDS})
+    if hasattr(instance, 'updated_at'):
+        fields['updated_at'] = timezone.now()
+    # Only swap the files in if nobody uploaded a new image in the meantime
+    if model.objects.filter(pk=pk, image=name).update(**fields):
+        discard_media(replaced)
+        if isinstance(instance, UserProfilePhoto):
+            # The update bypasses post_save
+            profiles.invalidate(instance.user_id)
+    else:
+        discard_media(media_names(instance))
+
+
+@shared_task
+def archive_moments_task():
+    archive_moments()
+
+
+def enqueue_email(subject, message, recipient_list):
+    """Queues an email once the current transaction commits."""
+    transaction.on_commit(
+        lambda: send_email_task.delay(subject, message, recipient_list),
+        robust=True,
+    )
+
+
+def enqueue_push(users, title, body, data=None):
+    """
+    Queues a push notification to all devices of `users` once the current
+    transaction commits. Types listed in COALESCED_PUSH (read from data['type'])
+    go through the per-recipient coalescing window first.
+    """
+    user_ids = [getattr(user, 'pk', user) for user in users]
+    if settings.PUSH_COALESCE_WINDOW_SECONDS and data and data.get('type') in COALESCED_PUSH:
+        task = coalesce_push_task
+    else:
+        task = send_push_task
+    transaction.on_commit(
+        lambda: task.delay(user_ids, title, body, data),
+        robust=True,
+    )
+
+
+def enqueue_image_processing(instance):
+    """Queues the image pipeline for `instance.image` once the current transaction commits."""
+    if not instance.image:
+        return
+    label, pk, name = instance._meta.label, instance.pk, instance.image.name
+    transaction.on_commit(
+        lambda: process_image_task.delay(label, pk, name),
+        robust=True,
+    )
@@ -0,0 +1,62 @@
+from datetime import timedelta
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from core.models import ArchivedMoment, ArchivedReply, Moment, MomentRecipient, Reply, User
+from api.archive import archive_moments
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username='alice', email='alice@x.com', password='p')
+        self.bob = User.objects.create_user(username='bob', email='bob@x.com', password='p')
+        now = timezone.now()
+        self.moments = []
+        for i in range(7):
+            moment = Moment.objects.create(sender=self.alice, text=f'm{i}', emoji='x', image=f'blobs/0{i}/{i}.webp')
+            MomentRecipient.objects.create(moment=moment, receiver=self.bob)
+            Reply.objects.create(parent_moment=moment, sender=self.bob, text=f'bob on m{i}', emoji='x')
+            # Four quiet for 100 days, three recent
+            instant = now - timedelta(days=100 if i < 4 else 1, hours=7 - i)
+            Moment.objects.filter(pk=moment.pk).update(created_at=instant, updated_at=instant)
+            MomentRecipient.objects.filter(moment=moment).update(updated_at=instant)
+            Reply.objects.filter(parent_moment=moment).update(created_at=instant, updated_at=instant)
+            self.moments.append(moment.pk)
+
+    def archive(self):
+        with mock.patch('api.signals.discard_media_on_commit') as discard, \
+                self.captureOnCommitCallbacks(execute=True):
+            moved = archive_moments(horizon_days=30)
+        # The archived copies still use the media
+        discard.assert_not_called()
+        return moved
+
+    def test_moves_quiet_threads_with_their_replies(self):
+        self.assertEqual(self.archive(), 4)
+        self.assertEqual(sorted(Moment.objects.values_list('pk', flat=True)), self.moments[4:])
+        self.assertEqual(sorted(ArchivedMoment.objects.values_list('pk', flat=True)), self.moments[:4])
+        self.assertEqual(ArchivedReply.objects.count(), 4)
+        self.assertEqual(Reply.objects.count(), 3)
+        self.assertEqual(ArchivedMoment.objects.get(pk=self.moments[0]).image, 'blobs/00/0.webp')
+
+    def test_feed_pages_on_into_the_archive(self):
+        self.archive()
+        client = APIClient()
+        client.force_authenticate(self.bob)
+
+        seen, cursor = [], None
+        while True:
+            response = client.get('/api/moments/', {'page_size': 2, **({'cursor': cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200)
+            for moment in response.json():
+                seen.append(moment['id'])
+                self.assertEqual(moment['reply_count'], 1)
+                self.assertEqual(moment['replies'][0]['text'], f"bob on {moment['text']}")
+            cursor = response.get('X-Cursor-Older')
+            if not cursor:
+                break
+            self.assertLess(len(seen), 10, 'paging did not stop')
+        self.assertEqual(seen, self.moments[::-1])
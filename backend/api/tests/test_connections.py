@@ -0,0 +1,19 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+from core.models import Connection, User
+
+
+class ConnectionPayloadTests(TestCase):
+    def test_payload_omits_the_canonical_pair(self):
+        alice = User.objects.create_user(username='alice', email='alice@x.com', password='p')
+        bob = User.objects.create_user(username='bob', email='bob@x.com', password='p')
+        Connection.objects.create(requester=bob, receiver=alice)
+        client = APIClient()
+        client.force_authenticate(alice)
+
+        response = client.get('/api/connections/', {'status': 'PENDING'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            set(response.json()[0]),
+            {'id', 'requester', 'receiver', 'status', 'created_at', 'updated_at'},
+        )
@@ -0,0 +1,48 @@
+from unittest import mock
+from celery.exceptions import Retry
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.db import transaction
+from django.test import TestCase, override_settings
+from api.tasks import enqueue_email, send_email_task
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True, CELERY_TASK_EAGER_PROPAGATES=True)
+class EnqueueEmailTests(TestCase):
+    def test_sent_once_the_transaction_commits(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                enqueue_email('Hi', 'Hello', ['bob@x.com', 'carol@x.com', ''])
+                self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(len(callbacks), 1)
+        # One message each, so recipients never see each other's addresses
+        self.assertEqual([message.to for message in mail.outbox], [['bob@x.com'], ['carol@x.com']])
+
+    def test_not_sent_when_the_transaction_rolls_back(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    enqueue_email('Hi', 'Hello', ['bob@x.com'])
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertEqual(mail.outbox, [])
+
+    def test_retries_only_the_recipients_that_failed(self):
+        send_messages = EmailBackend.send_messages
+
+        def flaky(backend, messages):
+            if messages[0].to == ['carol@x.com']:
+                raise ConnectionResetError('connection reset')
+            return send_messages(backend, messages)
+
+        # Eager tasks do not run their retries, so capture the one scheduled
+        with mock.patch.object(EmailBackend, 'send_messages', flaky), \
+                mock.patch.object(send_email_task, 'retry', return_value=Retry()) as retry:
+            with self.captureOnCommitCallbacks(execute=True):
+                enqueue_email('Hi', 'Hello', ['bob@x.com', 'carol@x.com', 'dave@x.com'])
+
+        self.assertEqual([message.to for message in mail.outbox], [['bob@x.com'], ['dave@x.com']])
+        retry.assert_called_once()
+        self.assertEqual(retry.call_args.kwargs['args'], ('Hi', 'Hello', ['carol@x.com']))
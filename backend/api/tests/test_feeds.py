@@ -0,0 +1,67 @@
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.renderers import JSONRenderer
+from core.models import Connection, Moment, MomentRecipient, Reply, User, UserProfilePhoto
+from api.feeds import moments_feed
+from api.profiles import public_profile
+from api.renderers import ORJSONRenderer
+from api.serializers import MomentSerializer, PublicUserSerializer
+
+
+@override_settings(FEED_REPLY_LIMIT=3)
+class FlatFeedParityTests(TestCase):
+    """The flat feeds, rendered by ORJSONRenderer, must be byte for byte what the serializers render."""
+
+    def setUp(self):
+        self.alice, self.bob, self.carol, self.dave = (
+            User.objects.create_user(username=name, email=f'{name}@x.com', password='p', avatar_emoji='🙂')
+            for name in ('alice', 'bob', 'carol', 'dave')
+        )
+        for friend in (self.bob, self.carol):
+            Connection.objects.create(requester=self.alice, receiver=friend, status='ACCEPTED')
+        Connection.objects.create(requester=self.dave, receiver=self.bob, status='PENDING')
+
+        with_image = Moment.objects.create(
+            sender=self.alice, text='photo', emoji='📷', image='blobs/ab/abc.webp',
+            image_thumbnail='blobs/cd/cde.webp', image_width=640, image_height=480, image_blurhash='LEHV6n',
+        )
+        busy = Moment.objects.create(sender=self.alice, text='héllo "there"', emoji='💓')
+        quiet = Moment.objects.create(sender=self.carol, text='', emoji='x')
+        for moment in (with_image, busy):
+            for friend in (self.bob, self.carol):
+                MomentRecipient.objects.create(moment=moment, receiver=friend)
+        MomentRecipient.objects.create(moment=quiet, receiver=self.alice)
+        # More replies than FEED_REPLY_LIMIT, some of them hidden from bob
+        for i, sender in enumerate((self.bob, self.carol, self.alice, self.bob, self.carol, self.alice)):
+            Reply.objects.create(parent_moment=busy, sender=sender, text=f'reply {i}', emoji='✨')
+        Reply.objects.create(parent_moment=with_image, sender=self.carol, text='nice', emoji='x')
+
+    def request(self, user):
+        request = RequestFactory().get('/api/moments/')
+        request.user = user
+        return request
+
+    def assertSameBytes(self, flat, serialized):
+        self.assertEqual(ORJSONRenderer().render(flat), JSONRenderer().render(serialized))
+
+    def test_moments_feed_matches_moment_serializer(self):
+        for viewer in (self.alice, self.bob, self.carol):
+            request = self.request(viewer)
+            queryset = Moment.objects.order_by('-created_at', '-id')
+            serialized = MomentSerializer(
+                MomentSerializer.setup_eager_loading(queryset, viewer.pk), many=True, context={'request': request},
+            ).data
+            self.assertSameBytes(moments_feed(queryset, request), serialized)
+
+    def test_public_profile_matches_public_user_serializer(self):
+        UserProfilePhoto.objects.create(
+            user=self.alice, image='blobs/ef/efg.webp', image_medium='blobs/gh/ghi.webp',
+            image_width=100, image_height=100, image_blurhash='L00000', order=1,
+        )
+        UserProfilePhoto.objects.create(user=self.alice, image='blobs/ij/ijk.webp', order=2)
+        for viewer, user in ((self.bob, self.alice), (self.bob, self.dave), (self.bob, self.carol), (self.alice, self.alice)):
+            request = self.request(viewer)
+            serialized = PublicUserSerializer(
+                PublicUserSerializer.setup_eager_loading(User.objects.filter(pk=user.pk)).get(),
+                context={'request': request},
+            ).data
+            self.assertSameBytes(public_profile(request, user.pk), serialized)
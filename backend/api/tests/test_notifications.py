@@ -0,0 +1,84 @@
+from unittest import mock
+from django.test import TestCase
+from firebase_admin import exceptions, messaging
+from core.models import DeviceToken, User
+from api import notifications
+from api.notifications import FCM_MULTICAST_LIMIT, deliver_push
+
+
+def sent(_token):
+    return messaging.SendResponse({'name': 'projects/pulse/messages/1'}, None)
+
+
+def failed(error):
+    return lambda _token: messaging.SendResponse(None, error)
+
+
+class DeliverPushTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', email='alice@x.com', password='p')
+        initialized = mock.patch.object(notifications, 'firebase_initialized', True)
+        initialized.start()
+        self.addCleanup(initialized.stop)
+
+    def fcm(self, outcomes=None):
+        """Patches FCM so token `t` gets outcomes.get(t, sent); returns the mock."""
+        outcomes = outcomes or {}
+
+        def send_each_for_multicast(message):
+            return messaging.BatchResponse([outcomes.get(token, sent)(token) for token in message.tokens])
+
+        patcher = mock.patch.object(messaging, 'send_each_for_multicast', side_effect=send_each_for_multicast)
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+
+    def test_multicasts_in_batches_of_the_fcm_limit(self):
+        tokens = [f'token-{i}' for i in range(FCM_MULTICAST_LIMIT * 2 + 3)]
+        send = self.fcm()
+
+        self.assertEqual(deliver_push([self.user.pk], 'Title', 'Body', tokens=tokens), [])
+        self.assertEqual([len(call.args[0].tokens) for call in send.call_args_list], [500, 500, 3])
+        self.assertEqual([token for call in send.call_args_list for token in call.args[0].tokens], tokens)
+
+    def test_looks_up_the_users_devices(self):
+        DeviceToken.objects.create(user=self.user, token='phone')
+        DeviceToken.objects.create(user=self.user, token='tablet')
+        send = self.fcm()
+
+        deliver_push([self.user.pk], 'Title', 'Body', data={'moment_id': 7})
+        message = send.call_args.args[0]
+        self.assertEqual(sorted(message.tokens), ['phone', 'tablet'])
+        self.assertEqual(message.data, {'moment_id': '7'})
+
+    def test_prunes_dead_tokens_and_returns_transient_failures(self):
+        for token in ('ok', 'unregistered', 'invalid', 'unavailable'):
+            DeviceToken.objects.create(user=self.user, token=token)
+        self.fcm({
+            'unregistered': failed(messaging.UnregisteredError('gone')),
+            'invalid': failed(exceptions.InvalidArgumentError('bad token')),
+            'unavailable': failed(exceptions.UnavailableError('try later')),
+        })
+
+        retry = deliver_push([self.user.pk], 'Title', 'Body')
+        self.assertEqual(retry, ['unavailable'])
+        self.assertEqual(
+            sorted(DeviceToken.objects.values_list('token', flat=True)), ['ok', 'unavailable'],
+        )
+
+    def test_keeps_tokens_when_every_one_is_rejected_as_invalid(self):
+        # The payload is at fault, not the devices
+        for token in ('phone', 'tablet'):
+            DeviceToken.objects.create(user=self.user, token=token)
+        self.fcm({token: failed(exceptions.InvalidArgumentError('bad payload')) for token in ('phone', 'tablet')})
+
+        with self.assertLogs('api.notifications', 'ERROR'):
+            self.assertEqual(deliver_push([self.user.pk], 'Title', 'Body'), [])
+        self.assertEqual(DeviceToken.objects.count(), 2)
+
+    def test_retries_every_token_of_a_failed_request(self):
+        tokens = [f'token-{i}' for i in range(3)]
+        patcher = mock.patch.object(messaging, 'send_each_for_multicast', side_effect=exceptions.UnavailableError('down'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.assertEqual(deliver_push([self.user.pk], 'Title', 'Body', tokens=tokens), tokens)
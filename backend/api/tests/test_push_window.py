@@ -0,0 +1,111 @@
+import threading
+from unittest import mock
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from api import notifications
+from api.notifications import MISSED, close_push_window, open_push_window
+
+# Flushes run from a countdown task that eager Celery runs at once, so these
+# drive the window directly instead of through coalesce_push_task
+WINDOW_CACHE = {'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'push-window-tests',
+    'OPTIONS': {'MAX_ENTRIES': 100000},
+}}
+
+
+@override_settings(CACHES=WINDOW_CACHE, PUSH_COALESCE_WINDOW_SECONDS=60)
+class PushWindowTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_collects_notifications_until_flushed(self):
+        window = open_push_window(1, 'moment', 10, {'moment_id': '1'})
+        self.assertIsNotNone(window)
+        self.assertIsNone(open_push_window(1, 'moment', 11, {'moment_id': '2'}))
+        self.assertIsNone(open_push_window(1, 'moment', 10, {'moment_id': '3'}))
+        # Other recipients and kinds have windows of their own
+        self.assertIsNotNone(open_push_window(2, 'moment', 10, {}))
+        self.assertIsNotNone(open_push_window(1, 'reply', 10, {}))
+
+        self.assertEqual(close_push_window(1, 'moment', window), (3, [10, 11], {'moment_id': '3'}))
+        # A second flush finds nothing
+        self.assertEqual(close_push_window(1, 'moment', window), (0, [], {}))
+
+    def test_notification_after_the_flush_opens_the_next_window(self):
+        first = open_push_window(1, 'moment', 10, {})
+        self.assertEqual(close_push_window(1, 'moment', first)[0], 1)
+
+        second = open_push_window(1, 'moment', 11, {})
+        self.assertNotIn(second, (None, first))
+        self.assertIsNone(open_push_window(1, 'moment', 12, {}))
+        self.assertEqual(close_push_window(1, 'moment', second)[:2], (2, [11, 12]))
+
+    def test_slot_claimed_by_the_flush_moves_to_the_next_window(self):
+        window = open_push_window(1, 'moment', 10, {})
+        self.assertIsNone(open_push_window(1, 'moment', 11, {}))
+        slot, flushed = notifications._slot_key(1, 'moment', window, 2), []
+        add = cache.add
+
+        def flush_before_writing(key, value, *args, **kwargs):
+            # Numbered into the window, then the flush runs before its slot is written
+            if key == slot and value != MISSED:
+                flushed.append(close_push_window(1, 'moment', window))
+            return add(key, value, *args, **kwargs)
+
+        with mock.patch.object(cache, 'add', side_effect=flush_before_writing):
+            late = open_push_window(1, 'moment', 12, {})
+
+        self.assertEqual(flushed, [(2, [10, 11], {})])
+        self.assertEqual(cache.get(slot), MISSED)
+        self.assertIsNotNone(late)
+        self.assertEqual(close_push_window(1, 'moment', late)[:2], (1, [12]))
+
+    def test_increment_after_the_seal_moves_to_the_next_window(self):
+        window = open_push_window(1, 'moment', 10, {})
+        self.assertEqual(close_push_window(1, 'moment', window)[0], 1)
+        get = cache.get
+        reads = []
+
+        def stale_window(key, *args, **kwargs):
+            # The first read of the window happened just before the flush
+            if key == notifications._window_key(1, 'moment') and not reads:
+                reads.append(key)
+                return window
+            return get(key, *args, **kwargs)
+
+        with mock.patch.object(cache, 'get', side_effect=stale_window):
+            late = open_push_window(1, 'moment', 11, {})
+        self.assertNotIn(late, (None, window))
+        self.assertEqual(close_push_window(1, 'moment', late)[:2], (1, [11]))
+
+    def test_no_notification_is_lost_under_concurrency(self):
+        threads, per_thread = 8, 200
+        opened, flushed, lock = [], [], threading.Lock()
+
+        def notify(actor):
+            for _ in range(per_thread):
+                window = open_push_window(1, 'moment', actor, {})
+                if window:
+                    with lock:
+                        opened.append(window)
+
+        def flush():
+            while not done.is_set():
+                flushed.append(close_push_window(1, 'moment')[0])
+
+        done = threading.Event()
+        flusher = threading.Thread(target=flush)
+        flusher.start()
+        workers = [threading.Thread(target=notify, args=(actor,)) for actor in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        done.set()
+        flusher.join()
+
+        # Every notification was counted by exactly one flush: the ones above,
+        # or the scheduled one of each window opened (a no-op once flushed)
+        counted = sum(flushed) + sum(close_push_window(1, 'moment', window)[0] for window in opened)
+        self.assertEqual(counted, threads * per_thread)
@@ -0,0 +1,73 @@
+from unittest import mock
+from django.core.cache import cache
+from django.db import connections
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from core.models import Connection, Moment, MomentRecipient, User
+from api import replicas
+
+# A replica as DATABASE_REPLICA_URL configures it for tests: a second alias
+# mirroring the primary, so the routing between them shows without a second server
+if 'replica_1' not in connections:
+    connections.settings['replica_1'] = {
+        **connections.settings['default'],
+        'TEST': {**connections.settings['default']['TEST'], 'MIRROR': 'default'},
+    }
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = {'default', 'replica_1'}
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(replicas, 'REPLICAS', ['replica_1'])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.alice = User.objects.create_user(username='alice', email='alice@x.com', password='p')
+        self.bob = User.objects.create_user(username='bob', email='bob@x.com', password='p')
+        Connection.objects.create(requester=self.alice, receiver=self.bob, status='ACCEPTED')
+        self.moment = Moment.objects.create(sender=self.alice, text='hi', emoji='x')
+        MomentRecipient.objects.create(moment=self.moment, receiver=self.bob)
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.bob).access_token}')
+
+    def request(self, method, url, data=None):
+        """Makes the request; returns its body and the tables each alias read or wrote."""
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica_1']) as replica:
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertLess(response.status_code, 300, response.content)
+        return response.json(), tables(primary), tables(replica)
+
+    def test_safe_requests_read_from_the_replica(self):
+        for url, table in (
+            ('/api/moments/', 'core_moment'),
+            # The connection check fills the graph cache, from the primary (see api.replicas)
+            (f'/api/conversations/{self.alice.pk}/', 'core_moment'),
+            ('/api/connections/', 'core_connection'),
+        ):
+            body, primary, replica = self.request('get', url)
+            self.assertEqual(len(body), 1)
+            self.assertIn(table, replica)
+            self.assertNotIn(table, primary)
+
+    def test_writes_go_to_the_primary_and_pin_the_user_to_it(self):
+        _, primary, replica = self.request('post', '/api/moments/read/', {'all': True})
+        self.assertIn('core_momentrecipient', primary)
+        self.assertEqual(replica, set())
+
+        # What was just written is read back from the primary
+        _, primary, replica = self.request('get', '/api/moments/')
+        self.assertIn('core_moment', primary)
+        self.assertEqual(replica, set())
+
+
+def tables(context):
+    return {table for query in context.captured_queries for table in TABLES if f'"{table}"' in query['sql']}
+
+
+TABLES = ('core_moment', 'core_momentrecipient', 'core_reply', 'core_connection')
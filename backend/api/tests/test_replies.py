@@ -0,0 +1,47 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+from core.models import Connection, Moment, MomentRecipient, Reply, User
+
+
+class ReplyVisibilityTests(TestCase):
+    """alice sends one moment to bob and carol, who are not connected to each other."""
+
+    def setUp(self):
+        self.alice, self.bob, self.carol = (
+            User.objects.create_user(username=name, email=f'{name}@x.com', password='p')
+            for name in ('alice', 'bob', 'carol')
+        )
+        for friend in (self.bob, self.carol):
+            Connection.objects.create(requester=self.alice, receiver=friend, status='ACCEPTED')
+        self.moment = Moment.objects.create(sender=self.alice, text='hi', emoji='x')
+        for friend in (self.bob, self.carol):
+            MomentRecipient.objects.create(moment=self.moment, receiver=friend)
+        for sender, text in ((self.bob, 'from bob'), (self.carol, 'from carol'), (self.alice, 'from alice')):
+            Reply.objects.create(parent_moment=self.moment, sender=sender, text=text, emoji='x')
+
+    def get(self, user, url):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(b'@x.com', response.content)
+        return response.json()
+
+    def thread(self, moment):
+        return [reply['text'] for reply in moment['replies']], moment['reply_count']
+
+    def test_recipients_only_see_the_senders_replies_and_their_own(self):
+        expected = (['from bob', 'from alice'], 2)
+        self.assertEqual(self.thread(self.get(self.bob, '/api/moments/')[0]), expected)
+        self.assertEqual(self.thread(self.get(self.bob, f'/api/conversations/{self.alice.pk}/')[0]), expected)
+
+        synced = self.get(self.bob, '/api/sync/')
+        self.assertEqual(self.thread(synced['moments'][0]), expected)
+        self.assertEqual(sorted(reply['text'] for reply in synced['replies']), ['from alice', 'from bob'])
+
+    def test_the_sender_sees_every_reply(self):
+        conversation = self.get(self.alice, f'/api/conversations/{self.carol.pk}/')[0]
+        self.assertEqual(self.thread(conversation), (['from bob', 'from carol', 'from alice'], 3))
+        synced = self.get(self.alice, '/api/sync/')
+        self.assertEqual(self.thread(synced['moments'][0]), (['from bob', 'from carol', 'from alice'], 3))
+        self.assertEqual(len(synced['replies']), 3)
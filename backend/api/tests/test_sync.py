@@ -0,0 +1,70 @@
+from datetime import timedelta
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from core.models import Connection, Moment, MomentRecipient, User
+from api.sync import decode_cursor, encode_cursor
+
+
+@override_settings(SYNC_PAGE_SIZE=50)
+class SyncCursorTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', email='alice@x.com', password='p')
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def sync_all(self, cursor=None):
+        pages, seen = 0, {'moments': set(), 'receipts': set(), 'connections': set()}
+        while True:
+            response = self.client.get('/api/sync/', {'cursor': cursor} if cursor else {})
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            seen['moments'] |= {m['id'] for m in body['moments']}
+            seen['receipts'] |= {(r['moment_id'], r['receiver_id']) for r in body['receipts']}
+            seen['connections'] |= {c['id'] for c in body['connections']}
+            cursor, pages = body['cursor'], pages + 1
+            if not body['has_more']:
+                return seen, cursor, pages
+            self.assertLess(pages, 20, 'sync did not make progress')
+
+    def test_pages_through_rows_sharing_one_timestamp(self):
+        User.objects.bulk_create([User(username=f'u{i}', invite_id=f'U{i}') for i in range(120)])
+        moment = Moment.objects.create(sender=self.alice, text='hi', emoji='x')
+        MomentRecipient.objects.bulk_create([
+            MomentRecipient(moment=moment, receiver=user) for user in User.objects.exclude(pk=self.alice.pk)
+        ])
+        MomentRecipient.objects.update(updated_at=timezone.now() - timedelta(minutes=5))
+
+        seen, cursor, pages = self.sync_all()
+        self.assertEqual(len(seen['receipts']), 120)
+        self.assertEqual(pages, 3)
+
+        body = self.client.get('/api/sync/', {'cursor': cursor}).json()
+        self.assertEqual(body['receipts'], [])
+
+    def test_tables_keep_their_own_position(self):
+        # Receipts and connections share a timestamp but not an id space
+        others = [User.objects.create(username=f'u{i}', invite_id=f'U{i}') for i in range(60)]
+        moment = Moment.objects.create(sender=self.alice, text='hi', emoji='x')
+        MomentRecipient.objects.bulk_create([MomentRecipient(moment=moment, receiver=user) for user in others])
+        for user in others[:55]:
+            Connection.objects.create(requester=self.alice, receiver=user, status='ACCEPTED')
+        instant = timezone.now() - timedelta(minutes=5)
+        MomentRecipient.objects.update(updated_at=instant)
+        Connection.objects.update(updated_at=instant)
+
+        seen, _, _ = self.sync_all()
+        self.assertEqual(len(seen['receipts']), 60)
+        self.assertEqual(len(seen['connections']), 55)
+
+    def test_image_urls_are_absolute(self):
+        Moment.objects.create(sender=self.alice, text='hi', emoji='x', image='blobs/ab/abc.webp')
+        body = self.client.get('/api/sync/').json()
+        self.assertEqual(body['moments'][0]['image'], 'http://testserver/media/blobs/ab/abc.webp')
+
+    def test_cursor_round_trip(self):
+        instant = timezone.now()
+        positions = {'moments': (instant, 3), 'replies': (instant, None), 'receipts': (instant, 7),
+                     'connections': (instant, 1)}
+        self.assertEqual(decode_cursor(encode_cursor(positions)), positions)
+        self.assertEqual(self.client.get('/api/sync/', {'cursor': 'garbage'}).status_code, 400)
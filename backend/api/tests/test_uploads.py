@@ -0,0 +1,67 @@
+from unittest import mock
+from urllib.parse import urlsplit
+import boto3
+import requests
+from django.test import TestCase, override_settings
+from moto import mock_aws
+from rest_framework.test import APIClient
+from storages.backends.s3 import S3Storage
+from core.models import User
+from api import uploads
+from api.uploads import claim_upload
+
+S3_OPTIONS = {
+    'bucket_name': 'pulse-test',
+    'region_name': 'us-east-1',
+    'access_key': 'testing',
+    'secret_key': 'testing',
+    'file_overwrite': False,
+}
+
+
+def s3_storage(**options):
+    """Switches uploads to S3Storage with `options`, as the settings do when a bucket is configured."""
+    options = {**S3_OPTIONS, **options}
+    storages = {'default': {'BACKEND': 'storages.backends.s3.S3Storage', 'OPTIONS': options}}
+
+    def decorator(test):
+        # Django 4.2 drops OPTIONS from an overridden default storage, so the instance is patched in
+        test = mock.patch.object(uploads, 'default_storage', S3Storage(**options))(test)
+        return override_settings(STORAGES=storages)(test)
+    return decorator
+
+
+@mock_aws
+class PresignedUploadTests(TestCase):
+    def setUp(self):
+        self.s3 = boto3.client('s3', region_name='us-east-1')
+        self.s3.create_bucket(Bucket='pulse-test')
+        self.user = User.objects.create_user(username='alice', email='alice@x.com', password='p')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def intent(self):
+        response = self.client.post('/api/uploads/', {'kind': 'moment', 'content_type': 'image/png'})
+        self.assertEqual(response.status_code, 201)
+        return response.json()
+
+    @s3_storage(location='media')
+    @override_settings(UPLOAD_PRESIGN_ENDPOINT_URL=None)
+    def test_presigned_put_lands_where_the_storage_reads_it(self):
+        intent = self.intent()
+        url = urlsplit(intent['url'])
+        self.assertRegex(url.path, r'^/(pulse-test/)?media/moments/[0-9a-f]{32}\.png$')
+
+        response = requests.put(intent['url'], data=b'png bytes', headers=intent['headers'])
+        self.assertEqual(response.status_code, 200)
+
+        key = claim_upload(self.user, intent['upload_token'], 'moment')
+        self.assertRegex(key, r'^moments/[0-9a-f]{32}\.png$')
+        self.assertEqual(self.s3.get_object(Bucket='pulse-test', Key=f'media/{key}')['Body'].read(), b'png bytes')
+
+    @s3_storage()
+    @override_settings(UPLOAD_PRESIGN_ENDPOINT_URL='http://localhost:9000')
+    def test_signs_for_the_public_endpoint(self):
+        url = urlsplit(self.intent()['url'])
+        self.assertEqual(url.netloc, 'localhost:9000')
+        self.assertRegex(url.path, r'^/pulse-test/moments/[0-9a-f]{32}\.png$')
@@ -0,0 +1,154 @@
+"""
+Direct uploads.
+
+Instead of streaming multipart bodies through the API, a client asks for an
+upload intent, PUTs the image straight to object storage with the presigned
+URL it gets back, then passes the signed `upload_token` to the endpoint that
+creates the moment or profile photo (the finalize step).
+
+With the local filesystem storage there is nothing to presign, so the URL
+points at UploadTargetView instead and the same client flow keeps working in
+development.
+"""
+import functools
+import uuid
+import boto3
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.urls import reverse
+
+SALT = 'api.uploads'
+
+# Upload kind -> key prefix, matching the upload_to of the model field it ends up in
+UPLOAD_KINDS = {
+    'moment': 'moments/',
+    'profile_photo': 'profile_photos/',
+}
+
+CONTENT_TYPES = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'image/webp': 'webp',
+}
+
+# A PUT started just before its URL expires still needs to be finalized
+FINALIZE_GRACE_SECONDS = 300
+
+
+class InvalidUpload(ValueError):
+    pass
+
+
+def _is_object_storage(storage):
+    return getattr(storage, 'bucket_name', None) is not None
+
+
+@functools.lru_cache(maxsize=1)
+def _s3_client(endpoint_url, region_name, access_key, secret_key):
+    return boto3.client(
+        's3',
+        endpoint_url=endpoint_url,
+        region_name=region_name,
+        aws_access_key_id=access_key,
+        aws_secret_access_key=secret_key,
+    )
+
+
+def _presign_client():
+    # Built from the same settings as the storage; a change of them gets a new client
+    options = settings.STORAGES['default'].get('OPTIONS', {})
+    return _s3_client(
+        # Signatures cover the host, so sign with the endpoint clients will actually reach
+        settings.UPLOAD_PRESIGN_ENDPOINT_URL or options.get('endpoint_url'),
+        options.get('region_name'),
+        options.get('access_key'),
+        options.get('secret_key'),
+    )
+
+
+def _object_key(storage, name):
+    # The bucket key for a storage name: the storage's location prefix, if any, plus the name
+    location = storage.location.strip('/')
+    return f"{location}/{name}" if location else name
+
+
+def create_upload(request, kind, content_type):
+    """Returns an upload intent: where and how to PUT the image, and the token to finalize it with."""
+    if kind not in UPLOAD_KINDS:
+        raise InvalidUpload('Unknown upload kind')
+    if content_type not in CONTENT_TYPES:
+        raise InvalidUpload('Unsupported content type')
+
+    key = default_storage.get_available_name(f"{UPLOAD_KINDS[kind]}{uuid.uuid4().hex}.{CONTENT_TYPES[content_type]}")
+    token = signing.dumps(
+        {'u': request.user.id, 'kind': kind, 'key': key, 'ct': content_type}, salt=SALT
+    )
+
+    if _is_object_storage(default_storage):
+        url = _presign_client().generate_presigned_url(
+            'put_object',
+            Params={
+                'Bucket': default_storage.bucket_name,
+                'Key': _object_key(default_storage, key),
+                'ContentType': content_type,
+            },
+            ExpiresIn=settings.UPLOAD_URL_EXPIRY_SECONDS,
+        )
+    else:
+        url = request.build_absolute_uri(reverse('upload-target', args=[token]))
+
+    return {
+        'upload_token': token,
+        'url': url,
+        'method': 'PUT',
+        'headers': {'Content-Type': content_type},
+        'expires_in': settings.UPLOAD_URL_EXPIRY_SECONDS,
+        'max_bytes': settings.UPLOAD_MAX_BYTES,
+    }
+
+
+def _load_token(token, max_age):
+    try:
+        return signing.loads(token, salt=SALT, max_age=max_age)
+    except signing.BadSignature:
+        raise InvalidUpload('Invalid upload token')
+
+
+def receive_local_upload(token, content_type, content_length, stream):
+    """Stores a PUT body for the filesystem storage, where no presigned URL exists."""
+    payload = _load_token(token, settings.UPLOAD_URL_EXPIRY_SECONDS)
+    if content_type != payload['ct']:
+        raise InvalidUpload('Content type does not match the upload intent')
+    if not 0 < content_length <= settings.UPLOAD_MAX_BYTES:
+        raise InvalidUpload('Upload too large')
+    if default_storage.exists(payload['key']):
+        raise InvalidUpload('Upload already received')
+    default_storage.save(payload['key'], File(stream, name=payload['key']))
+
+
+def claim_upload(user, token, kind):
+    """
+    Finalize step: checks `token` was issued to `user` for `kind` and that the
+    object has arrived, and returns its storage key. Each token can be claimed
+    once, so the same object is never attached to two rows.
+    """
+    payload = _load_token(token, settings.UPLOAD_URL_EXPIRY_SECONDS + FINALIZE_GRACE_SECONDS)
+    if payload['u'] != user.id or payload['kind'] != kind:
+        raise InvalidUpload('Invalid upload token')
+
+    key = payload['key']
+    try:
+        size = default_storage.size(key)
+    except FileNotFoundError:
+        raise InvalidUpload('Upload not found')
+    if size > settings.UPLOAD_MAX_BYTES:
+        # Presigned PUTs cannot cap the body size, so oversized objects are dropped here
+        default_storage.delete(key)
+        raise InvalidUpload('Upload too large')
+
+    if not cache.add(f"upload:claimed:{key}", user.id, settings.UPLOAD_URL_EXPIRY_SECONDS + FINALIZE_GRACE_SECONDS):
+        raise InvalidUpload('Upload already used')
+    return key
@@ -4,7 +4,8 @@ from .views import (
     UserSearchView, ConnectionRequestView, ConnectionRespondView, ConnectionListView,
     MomentSendView, MomentListView, MomentReplyView, ActivityListView,
     ConversationListView, ProfilePhotoUploadView, PublicUserProfileView,
-    FCMTokenRegisterView
+    FCMTokenRegisterView, SyncView, UploadIntentView, UploadTargetView,
+    MomentReadView, ActivitySeenView, CountersView, DataExportView
 )
 
 urlpatterns = [
@@ -19,8 +20,15 @@ urlpatterns = [
     path('moments/send/', MomentSendView.as_view(), name='moment-send'),
     path('moments/', MomentListView.as_view(), name='moment-list'),
     path('moments/reply/', MomentReplyView.as_view(), name='moment-reply'),
+    path('moments/read/', MomentReadView.as_view(), name='moment-read'),
     path('activity/', ActivityListView.as_view(), name='activity-list'),
+    path('activity/seen/', ActivitySeenView.as_view(), name='activity-seen'),
+    path('counters/', CountersView.as_view(), name='counters'),
+    path('sync/', SyncView.as_view(), name='sync'),
+    path('export/', DataExportView.as_view(), name='data-export'),
     path('conversations/<int:user_id>/', ConversationListView.as_view(), name='conversation-detail'),
+    path('uploads/', UploadIntentView.as_view(), name='upload-intent'),
+    path('uploads/<str:token>/', UploadTargetView.as_view(), name='upload-target'),
     path('profile/photos/', ProfilePhotoUploadView.as_view(), name='profile-photo-upload'),
     path('profile/photos/<int:photo_id>/', ProfilePhotoUploadView.as_view(), name='profile-photo-delete'),
     path('users/<int:id>/', PublicUserProfileView.as_view(), name='public-user-profile'),
@@ -0,0 +1,28 @@
+"""
+Versioned cache keys.
+
+Entries cached per object (a user's connections, their public profile) are
+stored under keys that include a version number kept in the shared cache.
+Invalidating bumps the version, so everything cached under the old one stops
+being read at once and is left to expire; nothing has to be found and deleted.
+"""
+import time
+from django.core.cache import cache
+
+
+def current_version(key):
+    """The version stored under `key`, starting one if there is none."""
+    version = cache.get(key)
+    if version is None:
+        # A fresh token rather than 1, so entries cached under a version that
+        # was since evicted can never be picked up again.
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
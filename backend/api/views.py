@@ -2,16 +2,40 @@ from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
+from adrf.views import APIView as AsyncAPIView
+from asgiref.sync import sync_to_async
 from django.contrib.auth import authenticate
+from django.db import IntegrityError, transaction
+from django.core.files.storage import default_storage
+from django.core.handlers.asgi import ASGIRequest
 from django.db.models import Q
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.core.mail import send_mail
+from django.utils import timezone
+from django.views import View
 from .serializers import (
     UserSerializer, PublicUserSerializer, ConnectionSerializer, 
     MomentSerializer, ReplySerializer, UserProfilePhotoSerializer
 )
-from core.models import User, Connection, Moment, Reply, MomentRecipient, UserProfilePhoto
-from .notifications import send_push_notification
+from core.models import (
+    User, Connection, Moment, Reply, MomentRecipient, UserProfilePhoto, DeviceToken, ArchivedMoment
+)
+from .tasks import enqueue_email, enqueue_push, enqueue_image_processing
+from .events import publish_event, publish_events
+from .sync import collect_changes, decode_cursor, InvalidCursor
+from .pagination import KeysetPagination
+from .feeds import amoments_feed, areplies_feed
+from .archive import amoments_page
+from .export import aexport_chunks, export_chunks
+from .search import search_users
+from .uploads import InvalidUpload, create_upload, receive_local_upload, claim_upload
+from .media import (
+    BLOB_FILENAME, CONTENT_TYPES, IMMUTABLE_CACHE_CONTROL, UnsatisfiableRange,
+    blob_name, discard_media_on_commit, iter_range, media_names, parse_range,
+)
+from .profiles import public_profile
+from . import counters, graph
+from .authentication import TokenUserReadAuthentication
 
 class SignupView(generics.CreateAPIView):
     queryset = User.objects.all()
@@ -20,12 +44,10 @@ class SignupView(generics.CreateAPIView):
 
     def perform_create(self, serializer):
         user = serializer.save()
-        send_mail(
+        enqueue_email(
             "Welcome to Pulse! 💓",
             f"Hey {user.username}, welcome to Pulse. Start sharing your heartbeat with those who matter most.",
-            "pulseteam@pulse.app",
             [user.email],
-            fail_silently=True,
         )
 
 class LoginView(APIView):
@@ -51,29 +73,35 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     def get_object(self):
         return self.request.user
 
-class PublicUserProfileView(generics.RetrieveAPIView):
-    queryset = User.objects.all()
-    serializer_class = PublicUserSerializer
-    lookup_field = 'id'
+class PublicUserProfileView(APIView):
+    authentication_classes = (TokenUserReadAuthentication,)
 
-    def get_serializer_context(self):
-        context = super().get_serializer_context()
-        context.update({"request": self.request})
-        return context
+    def get(self, request, id):
+        # Cached profile with the viewer's connection status overlaid
+        profile = public_profile(request, id)
+        if profile is None:
+            raise Http404('No User matches the given query.')
+        return Response(profile)
 
-class UserSearchView(generics.ListAPIView):
-    serializer_class = PublicUserSerializer
-    
-    def get_queryset(self):
-        query = self.request.query_params.get('query', '')
-        # Search all users except self
-        users = User.objects.filter(Q(username__icontains=query) | Q(invite_id__iexact=query)).exclude(id=self.request.user.id)
-        return users
+class UserSearchView(AsyncAPIView):
+    async def get(self, request):
+        query = request.query_params.get('query', '')
+        try:
+            limit = max(int(request.query_params.get('limit', 0)), 0) or None
+        except ValueError:
+            limit = None
+        # Search runs raw index queries and the graph cache, so it stays sync
+        users, statuses = await sync_to_async(self.search)(request.user, query, limit)
+        context = {'request': request, 'connection_statuses': statuses}
+        return Response(PublicUserSerializer(users, many=True, context=context).data)
 
-    def get_serializer_context(self):
-        context = super().get_serializer_context()
-        context.update({"request": self.request})
-        return context
+    def search(self, user, query, limit):
+        # Ranked, index-backed search over all users except self
+        users = search_users(
+            user, query, limit=limit,
+            queryset=PublicUserSerializer.setup_eager_loading(User.objects.all()),
+        )
+        return users, Connection.objects.statuses_for(user, users)
 
 class ConnectionRequestView(APIView):
     def post(self, request):
@@ -84,10 +112,7 @@ class ConnectionRequestView(APIView):
             return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
             
         # Check if any connection exists in either direction
-        existing = Connection.objects.filter(
-            Q(requester=request.user, receiver=receiver) | 
-            Q(requester=receiver, receiver=request.user)
-        ).first()
+        existing = Connection.objects.between(request.user, receiver).first()
 
         if existing:
             if existing.status == 'REJECTED':
@@ -95,38 +120,51 @@ class ConnectionRequestView(APIView):
                 existing.requester = request.user
                 existing.receiver = receiver
                 existing.save()
-                return Response(ConnectionSerializer(existing).data, status=status.HTTP_200_OK)
+                counters.increment([receiver], 'pending_requests')
+                data = ConnectionSerializer(existing).data
+                publish_event(receiver.id, 'connection_request', data)
+                return Response(data, status=status.HTTP_200_OK)
             
             if existing.status == 'PENDING' and existing.receiver == request.user:
                 # If they sent a request to ME, auto-accept it instead of creating a new one
                 existing.status = 'ACCEPTED'
                 existing.save()
-                return Response(ConnectionSerializer(existing).data, status=status.HTTP_200_OK)
+                counters.decrement([request.user], 'pending_requests')
+                data = ConnectionSerializer(existing).data
+                publish_event(existing.requester_id, 'connection_accepted', data)
+                return Response(data, status=status.HTTP_200_OK)
             return Response(ConnectionSerializer(existing).data, status=status.HTTP_200_OK)
 
-        connection = Connection.objects.create(
-            requester=request.user,
-            receiver=receiver
-        )
+        try:
+            with transaction.atomic():
+                connection = Connection.objects.create(
+                    requester=request.user,
+                    receiver=receiver
+                )
+        except IntegrityError:
+            # Lost a race with a concurrent request for the same pair
+            existing = Connection.objects.between(request.user, receiver).first()
+            return Response(ConnectionSerializer(existing).data, status=status.HTTP_200_OK)
+        counters.increment([receiver], 'pending_requests')
 
         # Notify via Email (Mock)
-        send_mail(
+        enqueue_email(
             "New Circle Request 💓",
             f"Hey {receiver.username}, {request.user.username} wants to join your circle on Pulse! Spark a heartbeat now.",
-            "pulseteam@pulse.app",
             [receiver.email],
-            fail_silently=True,
         )
 
         # Send Push Notification
-        send_push_notification(
-            receiver, 
+        enqueue_push(
+            [receiver],
             "New Circle Request 💓", 
             f"{request.user.username} wants to join your circle! Spark a heartbeat now.",
             {"type": "connection_request", "sender_id": str(request.user.id)}
         )
 
-        return Response(ConnectionSerializer(connection).data, status=status.HTTP_201_CREATED)
+        data = ConnectionSerializer(connection).data
+        publish_event(receiver.id, 'connection_request', data)
+        return Response(data, status=status.HTTP_201_CREATED)
 
 class ConnectionRespondView(APIView):
     def post(self, request):
@@ -137,75 +175,137 @@ class ConnectionRespondView(APIView):
         except (Connection.DoesNotExist, ValueError):
             return Response({'error': 'Connection request not found'}, status=status.HTTP_404_NOT_FOUND)
             
+        previous_status = connection.status
         connection.status = status_val
         connection.save()
-        return Response(ConnectionSerializer(connection).data)
+        if previous_status == 'PENDING' and status_val != 'PENDING':
+            counters.decrement([request.user], 'pending_requests')
+        data = ConnectionSerializer(connection).data
+        if status_val == 'ACCEPTED':
+            publish_event(connection.requester_id, 'connection_accepted', data)
+        return Response(data)
 
 class ConnectionListView(generics.ListAPIView):
     serializer_class = ConnectionSerializer
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         status_filter = self.request.query_params.get('status', 'ACCEPTED')
         if status_filter == 'PENDING':
             # For pending, show only incoming requests for the dashboard
-            return Connection.objects.filter(receiver=self.request.user, status='PENDING')
-        return Connection.objects.filter(Q(requester=self.request.user) | Q(receiver=self.request.user), status='ACCEPTED')
+            connections = Connection.objects.filter(receiver=self.request.user, status='PENDING')
+        else:
+            connections = Connection.objects.filter(Q(requester=self.request.user) | Q(receiver=self.request.user), status='ACCEPTED')
+        return ConnectionSerializer.setup_eager_loading(connections)
 
 class MomentSendView(APIView):
     def post(self, request):
-        receiver_id = request.data.get('receiver_id')
-        try:
-            receiver = User.objects.get(id=receiver_id)
-        except (User.DoesNotExist, ValueError):
-            return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+        # Recipients: `receiver_ids` (list), `all_connections`, or the legacy single `receiver_id`
+        connected = graph.connections_of(request.user)
+        if str(request.data.get('all_connections', '')).lower() in ('1', 'true'):
+            receiver_ids = set(connected)
+        else:
+            try:
+                receiver_ids = self.get_receiver_ids(request)
+            except (TypeError, ValueError):
+                return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+        if not receiver_ids:
+            return Response({'error': 'No recipients'}, status=status.HTTP_400_BAD_REQUEST)
         
         text = request.data.get('text')
         emoji = request.data.get('emoji')
         image = request.FILES.get('image')
+        upload_token = request.data.get('upload_token')
 
-        # Verify connection
-        if not Connection.objects.filter(
-            (Q(requester=request.user) & Q(receiver=receiver)) | 
-            (Q(requester=receiver) & Q(receiver=request.user)),
-            status='ACCEPTED'
-        ).exists():
+        # Verify connection with every recipient in one set check against the graph cache
+        if not receiver_ids <= connected:
+            unknown = receiver_ids - connected
+            if User.objects.filter(id__in=unknown).count() < len(unknown):
+                return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
             return Response({'error': 'Not connected'}, status=status.HTTP_403_FORBIDDEN)
+
+        if upload_token:
+            # The image was uploaded directly to storage (see UploadIntentView)
+            try:
+                image = claim_upload(request.user, upload_token, 'moment')
+            except InvalidUpload as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
             
-        moment = Moment.objects.create(
-            sender=request.user,
-            text=text,
-            emoji=emoji,
-            image=image
-        )
-        # Create recipient entry
-        from core.models import MomentRecipient
-        MomentRecipient.objects.create(moment=moment, receiver=receiver)
+        with transaction.atomic():
+            # The image is stored once however many people receive it
+            moment = Moment.objects.create(
+                sender=request.user,
+                text=text,
+                emoji=emoji,
+                image=image
+            )
+            MomentRecipient.objects.bulk_create(
+                [MomentRecipient(moment=moment, receiver_id=receiver_id) for receiver_id in receiver_ids]
+            )
+            enqueue_image_processing(moment)
+            counters.increment(receiver_ids, 'moments')
         
-        # Notify recipient via Email (Mock)
-        send_mail(
+        # Notify recipients via Email (Mock)
+        enqueue_email(
             f"Pulse from {request.user.username} 💓",
             f"You've received a new moment: '{text}'. Open Pulse to reveal the heartbeat.",
-            "pulseteam@pulse.app",
-            [receiver.email],
-            fail_silently=True,
+            list(User.objects.filter(id__in=receiver_ids).values_list('email', flat=True)),
         )
         
-        # Send Push Notification
-        send_push_notification(
-            receiver,
+        # Send Push Notification, fanned out to every recipient in one task
+        enqueue_push(
+            receiver_ids,
             f"Pulse from {request.user.username} 💓",
             f"You've received a new moment: '{text}'.",
             {"type": "moment", "moment_id": str(moment.id), "sender_id": str(request.user.id)}
         )
         
-        return Response(MomentSerializer(moment).data, status=status.HTTP_201_CREATED)
+        data = MomentSerializer(moment).data
+        publish_events(receiver_ids, 'moment', data)
+        return Response(data, status=status.HTTP_201_CREATED)
 
-class MomentListView(generics.ListAPIView):
-    serializer_class = MomentSerializer
-    
-    def get_queryset(self):
-        # Return moments where user is the receiver
-        return Moment.objects.filter(recipients__receiver=self.request.user).order_by('-created_at')
+    def get_receiver_ids(self, request):
+        if hasattr(request.data, 'getlist') and 'receiver_ids' in request.data:
+            # Multipart: repeated fields or a single comma-separated value
+            values = request.data.getlist('receiver_ids')
+            if len(values) == 1:
+                values = values[0].split(',')
+        elif 'receiver_ids' in request.data:
+            values = request.data['receiver_ids']
+            if isinstance(values, str):
+                values = values.split(',')
+        else:
+            values = [request.data.get('receiver_id')]
+        return {int(value) for value in values if str(value).strip()}
+
+class MomentListView(AsyncAPIView):
+    async def get(self, request):
+        # Return moments where user is the receiver (ordering is applied by the paginator)
+        moments = Moment.objects.filter(recipients__receiver=request.user)
+        archived = ArchivedMoment.objects.filter(recipients__receiver=request.user)
+        paginator = KeysetPagination()
+        page = await amoments_page(paginator, request, moments, archived)
+        return paginator.get_paginated_response(page)
+
+class MomentReadView(APIView):
+    def post(self, request):
+        # Marks the given moments (or all of them) read in a single UPDATE
+        receipts = MomentRecipient.objects.filter(receiver=request.user, read_at__isnull=True)
+        if str(request.data.get('all', '')).lower() not in ('1', 'true'):
+            moment_ids = request.data.get('moment_ids')
+            if not isinstance(moment_ids, list):
+                return Response({'error': 'moment_ids must be a list'}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                receipts = receipts.filter(moment_id__in=[int(moment_id) for moment_id in moment_ids])
+            except (TypeError, ValueError):
+                return Response({'error': 'Invalid moment id'}, status=status.HTTP_400_BAD_REQUEST)
+
+        now = timezone.now()
+        # updated_at is set explicitly: bulk updates bypass auto_now, and delta sync relies on it
+        marked = receipts.update(read_at=now, updated_at=now)
+        if marked:
+            counters.decrement([request.user], 'moments', marked)
+        return Response({'marked': marked, **counters.counters_for(request.user)})
 
 class MomentReplyView(APIView):
     def post(self, request):
@@ -214,18 +314,14 @@ class MomentReplyView(APIView):
         emoji = request.data.get('emoji')
         
         try:
-            parent_moment = Moment.objects.get(id=parent_moment_id)
-        except Moment.DoesNotExist:
+            parent_moment = Moment.objects.select_related('sender').get(id=parent_moment_id)
+        except (Moment.DoesNotExist, ValueError):
             return Response({'error': 'Moment not found'}, status=status.HTTP_404_NOT_FOUND)
             
         # Security Check: Is the reply sender a friend of the moment sender?
         # Or is the reply sender the moment sender themselves?
-        if not (parent_moment.sender == request.user or 
-                Connection.objects.filter(
-                    Q(requester=request.user, receiver=parent_moment.sender) | 
-                    Q(requester=parent_moment.sender, receiver=request.user),
-                    status='ACCEPTED'
-                ).exists()):
+        if not (parent_moment.sender_id == request.user.id or
+                graph.is_connected(request.user, parent_moment.sender_id)):
             return Response({'error': 'Not authorized to reply to this moment'}, status=status.HTTP_403_FORBIDDEN)
 
         reply = Reply.objects.create(
@@ -234,63 +330,104 @@ class MomentReplyView(APIView):
             text=text,
             emoji=emoji
         )
-        
+        data = ReplySerializer(reply).data
         
         # Send Push Notification to Moment Sender
         if parent_moment.sender != request.user:
-            send_push_notification(
-                parent_moment.sender,
+            counters.increment([parent_moment.sender_id], 'replies')
+            enqueue_push(
+                [parent_moment.sender_id],
                 f"New Reply from {request.user.username} ✨",
                 f"'{text}'",
                 {"type": "reply", "moment_id": str(parent_moment.id), "sender_id": str(request.user.id)}
             )
+            publish_event(parent_moment.sender_id, 'reply', data)
 
-        return Response(ReplySerializer(reply).data, status=status.HTTP_201_CREATED)
+        return Response(data, status=status.HTTP_201_CREATED)
 
-class ActivityListView(APIView):
-    def get(self, request):
+class ActivityListView(AsyncAPIView):
+    # Polled every few seconds and only needs the user's id
+    authentication_classes = (TokenUserReadAuthentication,)
+
+    async def get(self, request):
         # Unified feed: 
         # 1. New moments sent TO me
         # 2. New replies to moments I SENT
         # 3. New connection requests TO me
-        
-        moments = Moment.objects.filter(recipients__receiver=request.user).order_by('-created_at')[:10]
-        replies = Reply.objects.filter(parent_moment__sender=request.user).exclude(sender=request.user).order_by('-created_at')[:10]
-        pending_requests = Connection.objects.filter(receiver=request.user, status='PENDING').order_by('-created_at')[:5]
+        user_id = request.user.pk
+        moments = Moment.objects.filter(recipients__receiver_id=user_id).order_by('-created_at')
+        replies = Reply.objects.filter(parent_moment__sender_id=user_id).exclude(sender_id=user_id).order_by('-created_at')
+        pending_requests = Connection.objects.filter(receiver_id=user_id, status='PENDING').order_by('-created_at')
+
+        pending_requests = [c async for c in ConnectionSerializer.setup_eager_loading(pending_requests)[:5]]
         
         return Response({
-            'moments': MomentSerializer(moments, many=True).data,
-            'replies': ReplySerializer(replies, many=True).data,
+            'moments': await amoments_feed(moments[:10], request),
+            'replies': await areplies_feed(replies[:10]),
             'pending_requests': ConnectionSerializer(pending_requests, many=True).data
         })
 
-class ConversationListView(APIView):
-    def get(self, request, user_id):
+class ActivitySeenView(APIView):
+    def post(self, request):
+        # Clears the replies badge once the activity screen has been opened
+        counters.mark_replies_seen(request.user)
+        return Response(counters.counters_for(request.user))
+
+class CountersView(APIView):
+    authentication_classes = (TokenUserReadAuthentication,)
+
+    def get(self, request):
+        return Response(counters.counters_for(request.user))
+
+class ConversationListView(AsyncAPIView):
+    async def get(self, request, user_id):
         # Fetch history between request.user and a specific user
-        target_user = get_object_or_404(User, id=user_id)
-        
-        # Security Check: Are they friends?
-        if not Connection.objects.filter(
-            Q(requester=request.user, receiver=target_user) | 
-            Q(requester=target_user, receiver=request.user),
-            status='ACCEPTED'
-        ).exists():
+        # Security Check: Are they friends? (answered from the graph cache)
+        if not await sync_to_async(graph.is_connected)(request.user, user_id):
+            if not await User.objects.filter(id=user_id).aexists():
+                raise Http404
             return Response({'error': 'You must be in a circle to view history'}, status=status.HTTP_403_FORBIDDEN)
 
         # Moments sent by either to the other
-        sent_moments = Moment.objects.filter(sender=request.user, recipients__receiver=target_user)
-        received_moments = Moment.objects.filter(sender=target_user, recipients__receiver=request.user)
-        
-        moments = (sent_moments | received_moments).distinct().order_by('created_at')
-        
-        return Response(MomentSerializer(moments, many=True).data)
+        def history(model):
+            sent_moments = model.objects.filter(sender=request.user, recipients__receiver_id=user_id)
+            received_moments = model.objects.filter(sender_id=user_id, recipients__receiver=request.user)
+            return (sent_moments | received_moments).distinct()
+
+        # Oldest-first within a page; the first page is the most recent stretch of history
+        paginator = KeysetPagination(ascending=True)
+        page = await amoments_page(paginator, request, history(Moment), history(ArchivedMoment))
+        return paginator.get_paginated_response(page)
+
+class SyncView(APIView):
+    def get(self, request):
+        # Delta sync: everything that changed since the client's opaque cursor
+        try:
+            positions = decode_cursor(request.query_params.get('cursor'))
+        except InvalidCursor:
+            return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+
+        changes, cursor, has_more = collect_changes(request.user, positions)
+        context = {'request': request}
+        return Response({
+            'cursor': cursor,
+            'has_more': has_more,
+            'moments': MomentSerializer(changes['moments'], many=True, context=context).data,
+            'replies': ReplySerializer(changes['replies'], many=True, context=context).data,
+            'receipts': [
+                {'moment_id': r.moment_id, 'receiver_id': r.receiver_id, 'read_at': r.read_at}
+                for r in changes['receipts']
+            ],
+            'connections': ConnectionSerializer(changes['connections'], many=True, context=context).data,
+        })
 
 class ProfilePhotoUploadView(APIView):
     def post(self, request):
         image = request.FILES.get('image')
+        upload_token = request.data.get('upload_token')
         order = request.data.get('order', 1) # 1-4
         
-        if not image:
+        if not image and not upload_token:
             return Response({'error': 'No image provided'}, status=status.HTTP_400_BAD_REQUEST)
             
         try:
@@ -300,25 +437,132 @@ class ProfilePhotoUploadView(APIView):
         except ValueError:
             return Response({'error': 'Invalid order'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Update or create
+        if upload_token:
+            try:
+                image = claim_upload(request.user, upload_token, 'profile_photo')
+            except InvalidUpload as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Update or create, letting go of the photo previously in this slot
+        previous = UserProfilePhoto.objects.filter(user=request.user, order=order).first()
+        if previous:
+            discard_media_on_commit(media_names(previous))
         photo, created = UserProfilePhoto.objects.update_or_create(
             user=request.user,
             order=order,
-            defaults={'image': image}
+            defaults={
+                'image': image, 'image_thumbnail': None, 'image_medium': None,
+                'image_width': None, 'image_height': None, 'image_blurhash': '',
+            }
         )
+        enqueue_image_processing(photo)
         
         return Response(UserProfilePhotoSerializer(photo).data, status=status.HTTP_200_OK if not created else status.HTTP_201_CREATED)
     
     def delete(self, request, photo_id):
+        photo = get_object_or_404(UserProfilePhoto, id=photo_id, user=request.user)
         photo.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+class DataExportView(APIView):
+    def get(self, request):
+        # Streamed as it is built; under ASGI Django only streams async iterators
+        if isinstance(request._request, ASGIRequest):
+            chunks = aexport_chunks(request.user)
+        else:
+            chunks = export_chunks(request.user)
+        response = StreamingHttpResponse(chunks, content_type='application/zip')
+        filename = f"pulse-export-{request.user.id}-{timezone.now():%Y%m%d}.zip"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+class UploadIntentView(APIView):
+    def post(self, request):
+        # Hands out a presigned PUT so the image bytes never pass through the API
+        try:
+            intent = create_upload(request, request.data.get('kind'), request.data.get('content_type'))
+        except InvalidUpload as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(intent, status=status.HTTP_201_CREATED)
+
+class UploadTargetView(APIView):
+    # Stand-in for the object store's presigned URL when uploads are kept on local disk;
+    # the signed token in the URL is the only credential, as with a presigned PUT
+    authentication_classes = ()
+    permission_classes = (permissions.AllowAny,)
+
+    def put(self, request, token):
+        try:
+            receive_local_upload(
+                token,
+                request.content_type,
+                int(request.META.get('CONTENT_LENGTH') or 0),
+                request.stream,
+            )
+        except InvalidUpload as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(status=status.HTTP_200_OK)
+
 class FCMTokenRegisterView(APIView):
     def post(self, request):
         token = request.data.get('fcm_token')
         if not token:
             return Response({'error': 'No token provided'}, status=status.HTTP_400_BAD_REQUEST)
         
-        request.user.fcm_token = token
-        request.user.save()
+        # A device that switches accounts moves its token to the new user
+        DeviceToken.objects.update_or_create(token=token, defaults={'user': request.user})
         return Response({'status': 'Token registered successfully'})
+
+    def delete(self, request):
+        # Called on logout so the device stops receiving this user's pushes
+        token = request.data.get('fcm_token')
+        if not token:
+            return Response({'error': 'No token provided'}, status=status.HTTP_400_BAD_REQUEST)
+
+        DeviceToken.objects.filter(user=request.user, token=token).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class MediaBlobView(View):
+    # Serves content-addressed blobs from local storage; object stores and CDNs do this themselves
+    def get(self, request, shard, filename):
+        match = BLOB_FILENAME.match(filename)
+        if not match or match['digest'][:2] != shard:
+            raise Http404
+
+        # The name is the content hash, so the ETag never changes and neither may the cached copy
+        etag = f'"{match["digest"]}"'
+        headers = {'ETag': etag, 'Cache-Control': IMMUTABLE_CACHE_CONTROL, 'Accept-Ranges': 'bytes'}
+        if etag in request.headers.get('If-None-Match', '') or request.headers.get('If-None-Match') == '*':
+            response = HttpResponseNotModified()
+            for header, value in headers.items():
+                response[header] = value
+            return response
+
+        name = blob_name(match['digest'], match['ext'])
+        try:
+            size = default_storage.size(name)
+            f = default_storage.open(name, 'rb')
+        except FileNotFoundError:
+            raise Http404
+        content_type = CONTENT_TYPES[match['ext']]
+
+        byte_range = None
+        if request.headers.get('If-Range', etag) == etag:
+            try:
+                byte_range = parse_range(request.headers.get('Range'), size)
+            except UnsatisfiableRange:
+                f.close()
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+
+        if byte_range is None:
+            response = FileResponse(f, content_type=content_type)
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(iter_range(f, start, end), status=206, content_type=content_type)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = end - start + 1
+        for header, value in headers.items():
+            response[header] = value
+        return response
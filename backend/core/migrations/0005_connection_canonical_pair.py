@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    # Nullable until they are filled in by the next migration. The three steps
+    # are separate migrations, so each runs in a transaction of its own: on
+    # Postgres a table cannot be altered while updates to it have deferred
+    # foreign key checks pending.
+
+    dependencies = [
+        ('core', '0004_sync_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='connection',
+            name='low_user',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='connection',
+            name='high_user',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
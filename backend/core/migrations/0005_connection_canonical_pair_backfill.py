@@ -0,0 +1,59 @@
+from django.db import migrations
+from django.db.models import Case, Count, IntegerField, Value, When
+from django.db.models.functions import Greatest, Least
+
+STATUS_RANK = {'ACCEPTED': 0, 'PENDING': 1, 'REJECTED': 2}
+
+
+def backfill_pairs(apps, schema_editor):
+    """
+    Fills in the canonical pair for every connection and collapses reverse
+    duplicates (A->B and B->A), keeping the most advanced status and, among
+    equals, the most recently updated row.
+    """
+    Connection = apps.get_model('core', 'Connection')
+    Connection.objects.update(
+        low_user_id=Least('requester_id', 'receiver_id'),
+        high_user_id=Greatest('requester_id', 'receiver_id'),
+    )
+
+    duplicated = (
+        Connection.objects.values('low_user_id', 'high_user_id')
+        .annotate(n=Count('id')).filter(n__gt=1).order_by()
+    )
+    pairs = {(row['low_user_id'], row['high_user_id']) for row in duplicated}
+    if not pairs:
+        return
+
+    rank = Case(
+        *(When(status=status, then=Value(value)) for status, value in STATUS_RANK.items()),
+        default=Value(len(STATUS_RANK)), output_field=IntegerField(),
+    )
+    rows = (
+        Connection.objects.filter(low_user_id__in={low for low, _ in pairs})
+        .annotate(rank=rank)
+        .order_by('low_user_id', 'high_user_id', 'rank', '-updated_at', 'id')
+        .values_list('id', 'low_user_id', 'high_user_id')
+    )
+    kept, duplicates = set(), []
+    for connection_id, low_id, high_id in rows.iterator(chunk_size=2000):
+        if (low_id, high_id) not in pairs:
+            continue
+        if (low_id, high_id) in kept:
+            duplicates.append(connection_id)
+        else:
+            kept.add((low_id, high_id))
+
+    for start in range(0, len(duplicates), 500):
+        Connection.objects.filter(id__in=duplicates[start:start + 500]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_connection_canonical_pair'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_pairs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_connection_canonical_pair_backfill'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='connection',
+            name='low_user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='connection',
+            name='high_user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='connection',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='connection',
+            constraint=models.UniqueConstraint(fields=('low_user', 'high_user'), name='unique_connection_pair'),
+        ),
+        migrations.AddIndex(
+            model_name='connection',
+            index=models.Index(fields=['receiver', 'status'], name='connection_receiver_status'),
+        ),
+        migrations.AddIndex(
+            model_name='connection',
+            index=models.Index(fields=['requester', 'status'], name='connection_requester_status'),
+        ),
+    ]
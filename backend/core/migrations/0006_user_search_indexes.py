@@ -0,0 +1,73 @@
+from django.db import migrations
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # Serves username__istartswith, which Django renders as UPPER("username"::text) LIKE ...
+    'CREATE INDEX IF NOT EXISTS core_user_username_upper_prefix ON core_user (UPPER("username"::text) varchar_pattern_ops)',
+    # Serves username__icontains
+    'CREATE INDEX IF NOT EXISTS core_user_username_upper_trgm ON core_user USING gin (UPPER("username"::text) gin_trgm_ops)',
+]
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS core_user_username_upper_trgm",
+    "DROP INDEX IF EXISTS core_user_username_upper_prefix",
+]
+
+# External-content FTS5 table kept in sync with core_user by triggers
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE core_user_search USING fts5(username, content='core_user', content_rowid='id', tokenize='trigram')",
+    """CREATE TRIGGER core_user_search_ai AFTER INSERT ON core_user BEGIN
+        INSERT INTO core_user_search(rowid, username) VALUES (new.id, new.username);
+    END""",
+    """CREATE TRIGGER core_user_search_ad AFTER DELETE ON core_user BEGIN
+        INSERT INTO core_user_search(core_user_search, rowid, username) VALUES ('delete', old.id, old.username);
+    END""",
+    """CREATE TRIGGER core_user_search_au AFTER UPDATE OF username ON core_user BEGIN
+        INSERT INTO core_user_search(core_user_search, rowid, username) VALUES ('delete', old.id, old.username);
+        INSERT INTO core_user_search(rowid, username) VALUES (new.id, new.username);
+    END""",
+    "INSERT INTO core_user_search(core_user_search) VALUES ('rebuild')",
+]
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS core_user_search_au",
+    "DROP TRIGGER IF EXISTS core_user_search_ad",
+    "DROP TRIGGER IF EXISTS core_user_search_ai",
+    "DROP TABLE IF EXISTS core_user_search",
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_FORWARD)
+    elif vendor == 'sqlite':
+        from django.db import DatabaseError
+        try:
+            _run(schema_editor, SQLITE_FORWARD[:1])
+        except DatabaseError:
+            # SQLite older than 3.34 has no trigram tokenizer; api.search falls back to scans
+            return
+        _run(schema_editor, SQLITE_FORWARD[1:])
+
+
+def drop_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_REVERSE)
+    elif vendor == 'sqlite':
+        _run(schema_editor, SQLITE_REVERSE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_connection_canonical_pair_constraints'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def copy_fcm_tokens(apps, schema_editor):
+    User = apps.get_model('core', 'User')
+    DeviceToken = apps.get_model('core', 'DeviceToken')
+    seen = set()
+    tokens = []
+    for user_id, token in User.objects.exclude(fcm_token__isnull=True).exclude(fcm_token='').values_list('id', 'fcm_token').iterator():
+        if token in seen or len(token) > 255:
+            continue
+        seen.add(token)
+        tokens.append(DeviceToken(user_id=user_id, token=token))
+    DeviceToken.objects.bulk_create(tokens, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_user_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=255, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_seen_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='device_tokens', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(copy_fcm_tokens, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='user',
+            name='fcm_token',
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_device_tokens'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moment',
+            name='image_medium',
+            field=models.ImageField(blank=True, null=True, upload_to='moments/variants/'),
+        ),
+        migrations.AddField(
+            model_name='moment',
+            name='image_thumbnail',
+            field=models.ImageField(blank=True, null=True, upload_to='moments/variants/'),
+        ),
+        migrations.AddField(
+            model_name='userprofilephoto',
+            name='image_medium',
+            field=models.ImageField(blank=True, null=True, upload_to='profile_photos/variants/'),
+        ),
+        migrations.AddField(
+            model_name='userprofilephoto',
+            name='image_thumbnail',
+            field=models.ImageField(blank=True, null=True, upload_to='profile_photos/variants/'),
+        ),
+    ]
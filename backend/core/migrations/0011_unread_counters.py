@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_media_blobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnreadCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='unread_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('moments', models.PositiveIntegerField(default=0)),
+                ('replies', models.PositiveIntegerField(default=0)),
+                ('pending_requests', models.PositiveIntegerField(default=0)),
+                ('replies_seen_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
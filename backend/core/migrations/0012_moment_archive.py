@@ -0,0 +1,55 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:16
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_unread_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedMoment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('text', models.TextField()),
+                ('emoji', models.CharField(max_length=10)),
+                ('image', models.ImageField(blank=True, null=True, upload_to='moments/')),
+                ('image_thumbnail', models.ImageField(blank=True, null=True, upload_to='moments/variants/')),
+                ('image_medium', models.ImageField(blank=True, null=True, upload_to='moments/variants/')),
+                ('image_width', models.PositiveIntegerField(blank=True, null=True)),
+                ('image_height', models.PositiveIntegerField(blank=True, null=True)),
+                ('image_blurhash', models.CharField(blank=True, max_length=64)),
+                ('created_at', models.DateTimeField(db_index=True)),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('sender', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_sent_moments', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedReply',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('text', models.TextField()),
+                ('emoji', models.CharField(blank=True, max_length=10)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('parent_moment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='core.archivedmoment')),
+                ('sender', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_moment_replies', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedMomentRecipient',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('read_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField()),
+                ('moment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipients', to='core.archivedmoment')),
+                ('receiver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_received_moments', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
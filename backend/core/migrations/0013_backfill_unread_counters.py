@@ -0,0 +1,49 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:42
+
+from django.db import migrations
+from django.db.models import Count, F, Q
+
+
+def recount_unread_counters(apps, schema_editor):
+    # Rows used to be created on a user's first badge poll, so users who never
+    # polled have none and earlier rows may have missed changes; recount them all
+    User = apps.get_model('core', 'User')
+    UnreadCounter = apps.get_model('core', 'UnreadCounter')
+    MomentRecipient = apps.get_model('core', 'MomentRecipient')
+    Reply = apps.get_model('core', 'Reply')
+    Connection = apps.get_model('core', 'Connection')
+
+    def grouped(queryset, user_field):
+        return dict(queryset.values_list(user_field).annotate(n=Count('id')).order_by())
+
+    seen_at = 'parent_moment__sender__unread_counter__replies_seen_at'
+    moments = grouped(MomentRecipient.objects.filter(read_at__isnull=True), 'receiver_id')
+    replies = grouped(
+        Reply.objects.filter(Q(**{f'{seen_at}__isnull': True}) | Q(created_at__gt=F(seen_at)))
+        .exclude(sender_id=F('parent_moment__sender_id')),
+        'parent_moment__sender_id',
+    )
+    pending = grouped(Connection.objects.filter(status='PENDING'), 'receiver_id')
+
+    existing = {counter.user_id: counter for counter in UnreadCounter.objects.all()}
+    missing = []
+    for user_id in User.objects.values_list('id', flat=True).iterator():
+        counter = existing.get(user_id) or UnreadCounter(user_id=user_id)
+        counter.moments = moments.get(user_id, 0)
+        counter.replies = replies.get(user_id, 0)
+        counter.pending_requests = pending.get(user_id, 0)
+        if user_id not in existing:
+            missing.append(counter)
+    UnreadCounter.objects.bulk_update(existing.values(), ['moments', 'replies', 'pending_requests'], batch_size=500)
+    UnreadCounter.objects.bulk_create(missing, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_moment_archive'),
+    ]
+
+    operations = [
+        migrations.RunPython(recount_unread_counters, migrations.RunPython.noop),
+    ]
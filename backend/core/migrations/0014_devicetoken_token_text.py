@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_backfill_unread_counters'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='devicetoken',
+            name='token',
+            field=models.TextField(unique=True),
+        ),
+    ]
@@ -1,17 +1,47 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.db.models import Q
 import uuid
 
 class User(AbstractUser):
     invite_id = models.CharField(max_length=10, unique=True, blank=True)
     avatar_emoji = models.CharField(max_length=10, default="😊")
-    fcm_token = models.TextField(blank=True, null=True)
     
     def save(self, *args, **kwargs):
         if not self.invite_id:
             self.invite_id = str(uuid.uuid4())[:8].upper()
         super().save(*args, **kwargs)
 
+class DeviceToken(models.Model):
+    # One row per app install; a user is notified on every device they are signed in on
+    user = models.ForeignKey(User, related_name='device_tokens', on_delete=models.CASCADE)
+    # FCM documents no maximum length, so neither do we
+    token = models.TextField(unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_seen_at = models.DateTimeField(auto_now=True)
+
+class ConnectionQuerySet(models.QuerySet):
+    def between(self, user_a, user_b):
+        low_id, high_id = Connection.canonical_pair(user_a, user_b)
+        return self.filter(low_user_id=low_id, high_user_id=high_id)
+
+    def statuses_for(self, user, others):
+        """
+        Resolves `user`'s connection status with every user in `others` (users or ids)
+        in a single query. Users without a connection row are absent from the result.
+        """
+        other_ids = {getattr(other, 'pk', other) for other in others}
+        if not other_ids:
+            return {}
+        rows = self.filter(
+            Q(low_user=user, high_user_id__in=other_ids) | Q(high_user=user, low_user_id__in=other_ids)
+        ).values_list('low_user_id', 'high_user_id', 'status')
+        user_id = getattr(user, 'pk', user)
+        return {
+            high_id if low_id == user_id else low_id: status
+            for low_id, high_id, status in rows
+        }
+
 class Connection(models.Model):
     STATUS_CHOICES = (
         ('PENDING', 'Pending'),
@@ -20,23 +50,55 @@ class Connection(models.Model):
     )
     requester = models.ForeignKey(User, related_name='sent_connections', on_delete=models.CASCADE)
     receiver = models.ForeignKey(User, related_name='received_connections', on_delete=models.CASCADE)
+    # Undirected edge: the same two users in (lower id, higher id) order, so a
+    # pair lookup is a single probe of the unique index whichever way it was requested
+    low_user = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    high_user = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = ConnectionQuerySet.as_manager()
 
     class Meta:
-        unique_together = ('requester', 'receiver')
+        constraints = [
+            models.UniqueConstraint(fields=['low_user', 'high_user'], name='unique_connection_pair'),
+        ]
+        indexes = [
+            models.Index(fields=['receiver', 'status'], name='connection_receiver_status'),
+            models.Index(fields=['requester', 'status'], name='connection_requester_status'),
+        ]
+
+    @staticmethod
+    def canonical_pair(user_a, user_b):
+        ids = (getattr(user_a, 'pk', user_a), getattr(user_b, 'pk', user_b))
+        return min(ids), max(ids)
+
+    def save(self, *args, **kwargs):
+        self.low_user_id, self.high_user_id = self.canonical_pair(self.requester_id, self.receiver_id)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'low_user', 'high_user'}
+        super().save(*args, **kwargs)
 
 class Moment(models.Model):
     sender = models.ForeignKey(User, related_name='sent_moments', on_delete=models.CASCADE)
     text = models.TextField()
     emoji = models.CharField(max_length=10)
     image = models.ImageField(upload_to='moments/', blank=True, null=True)
+    # Filled in by the image pipeline (api.images) after upload
+    image_thumbnail = models.ImageField(upload_to='moments/variants/', blank=True, null=True)
+    image_medium = models.ImageField(upload_to='moments/variants/', blank=True, null=True)
+    image_width = models.PositiveIntegerField(null=True, blank=True)
+    image_height = models.PositiveIntegerField(null=True, blank=True)
+    image_blurhash = models.CharField(max_length=64, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
 class MomentRecipient(models.Model):
     moment = models.ForeignKey(Moment, related_name='recipients', on_delete=models.CASCADE)
     receiver = models.ForeignKey(User, related_name='received_moments', on_delete=models.CASCADE)
     read_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
 class Reply(models.Model):
     parent_moment = models.ForeignKey(Moment, related_name='replies', on_delete=models.CASCADE)
@@ -44,10 +106,66 @@ class Reply(models.Model):
     text = models.TextField()
     emoji = models.CharField(max_length=10, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+# Moments past the retention horizon, moved out of the hot tables with their
+# recipients and replies by api.archive. Rows keep their ids and timestamps,
+# and relation names match the hot models so the same queries work on both.
+class ArchivedMoment(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    sender = models.ForeignKey(User, related_name='archived_sent_moments', on_delete=models.CASCADE)
+    text = models.TextField()
+    emoji = models.CharField(max_length=10)
+    image = models.ImageField(upload_to='moments/', blank=True, null=True)
+    image_thumbnail = models.ImageField(upload_to='moments/variants/', blank=True, null=True)
+    image_medium = models.ImageField(upload_to='moments/variants/', blank=True, null=True)
+    image_width = models.PositiveIntegerField(null=True, blank=True)
+    image_height = models.PositiveIntegerField(null=True, blank=True)
+    image_blurhash = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(db_index=True)
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+class ArchivedMomentRecipient(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    moment = models.ForeignKey(ArchivedMoment, related_name='recipients', on_delete=models.CASCADE)
+    receiver = models.ForeignKey(User, related_name='archived_received_moments', on_delete=models.CASCADE)
+    read_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField()
+
+class ArchivedReply(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    parent_moment = models.ForeignKey(ArchivedMoment, related_name='replies', on_delete=models.CASCADE)
+    sender = models.ForeignKey(User, related_name='archived_moment_replies', on_delete=models.CASCADE)
+    text = models.TextField()
+    emoji = models.CharField(max_length=10, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+class UnreadCounter(models.Model):
+    # Badge counts kept up to date on write (see api.counters) so polling them is one primary key read
+    user = models.OneToOneField(User, primary_key=True, related_name='unread_counter', on_delete=models.CASCADE)
+    moments = models.PositiveIntegerField(default=0)
+    replies = models.PositiveIntegerField(default=0)
+    pending_requests = models.PositiveIntegerField(default=0)
+    replies_seen_at = models.DateTimeField(null=True, blank=True)
+
+class MediaBlob(models.Model):
+    # A stored file named by the SHA-256 of its content, shared by every field that references it
+    digest = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
 
 class UserProfilePhoto(models.Model):
     user = models.ForeignKey(User, related_name='profile_photos', on_delete=models.CASCADE)
     image = models.ImageField(upload_to='profile_photos/')
+    image_thumbnail = models.ImageField(upload_to='profile_photos/variants/', blank=True, null=True)
+    image_medium = models.ImageField(upload_to='profile_photos/variants/', blank=True, null=True)
+    image_width = models.PositiveIntegerField(null=True, blank=True)
+    image_height = models.PositiveIntegerField(null=True, blank=True)
+    image_blurhash = models.CharField(max_length=64, blank=True)
     order = models.PositiveSmallIntegerField(default=1) # 1-4
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -7,9 +7,21 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pulse_backend.settings')
 
-# Initialize Django ASGI application
+# Initialize Django ASGI application before importing anything that touches models
 django_asgi_app = get_asgi_application()
 
+from channels.routing import ProtocolTypeRouter, URLRouter
+from channels.security.websocket import AllowedHostsOriginValidator
+from api.middleware import JWTAuthMiddleware
+from api.routing import websocket_urlpatterns
+
+protocol_router = ProtocolTypeRouter({
+    'http': django_asgi_app,
+    'websocket': AllowedHostsOriginValidator(
+        JWTAuthMiddleware(URLRouter(websocket_urlpatterns))
+    ),
+})
+
 async def application(scope, receive, send):
     """
     ASGI application with lifespan protocol support.
@@ -24,4 +36,4 @@ async def application(scope, receive, send):
                 await send({'type': 'lifespan.shutdown.complete'})
                 return
     else:
-        await django_asgi_app(scope, receive, send)
+        await protocol_router(scope, receive, send)
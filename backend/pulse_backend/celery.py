@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from celery.signals import worker_process_init
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pulse_backend.settings')
@@ -15,6 +16,13 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Load task modules from all registered Django apps.
 app.autodiscover_tasks()
 
+@worker_process_init.connect
+def reset_database_pools(**kwargs):
+    # Connection pools are per process: drop any inherited from the parent
+    # without closing them, as its sockets are still in use there
+    from dj_db_conn_pool.core import pool_container
+    pool_container.clear()
+
 @app.task(bind=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 from pathlib import Path
 import os
 import dj_database_url
+from celery.schedules import crontab
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -68,6 +69,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.ReadReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'pulse_backend.urls'
@@ -94,13 +96,54 @@ WSGI_APPLICATION = 'pulse_backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    'default': dj_database_url.config(
-        default=os.environ.get('DATABASE_URL', f"sqlite:///{BASE_DIR / 'db.sqlite3'}"),
-        conn_max_age=600,
-        ssl_require=True
+DATABASE_URL = os.environ.get('DATABASE_URL', f"sqlite:///{BASE_DIR / 'db.sqlite3'}")
+
+# Read replicas (see api.replicas), comma-separated. Safe requests read from one
+# of them, except for users who wrote something in the last
+# DATABASE_REPLICA_PIN_SECONDS, who keep reading from the primary; keep it above
+# the replicas' worst lag.
+DATABASE_REPLICA_URLS = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URL', '').split(',') if url.strip()]
+DATABASE_REPLICA_PIN_SECONDS = int(os.environ.get('DATABASE_REPLICA_PIN_SECONDS', 10))
+
+# Pooled Postgres connections (see django-db-connection-pool). Under ASGI every
+# request runs its sync code on a thread of its own, so persistent per-thread
+# connections (CONN_MAX_AGE) are never reused; instead each request borrows a
+# connection from the per-process pool and hands it back when it finishes.
+DATABASE_POOL = os.environ.get('DATABASE_POOL', 'True') == 'True'
+DATABASE_POOL_OPTIONS = {
+    # Connections kept open per process, and how many more may be opened under load
+    'POOL_SIZE': int(os.environ.get('DATABASE_POOL_SIZE', 10)),
+    'MAX_OVERFLOW': int(os.environ.get('DATABASE_POOL_MAX_OVERFLOW', 10)),
+    # Seconds a request waits for a free connection before failing
+    'TIMEOUT': int(os.environ.get('DATABASE_POOL_TIMEOUT', 30)),
+    # Health checks: ping connections as they are borrowed, replace them after RECYCLE seconds
+    'PRE_PING': os.environ.get('DATABASE_POOL_PRE_PING', 'True') == 'True',
+    'RECYCLE': int(os.environ.get('DATABASE_POOL_RECYCLE', 900)),
+}
+
+
+def database_config(url):
+    is_postgres = url.startswith(('postgres', 'pgsql'))
+    pooled = DATABASE_POOL and is_postgres
+    config = dj_database_url.parse(
+        url,
+        conn_max_age=0 if pooled else 600,
+        ssl_require=is_postgres and os.environ.get('DATABASE_SSL_REQUIRE', 'True') == 'True',
     )
+    if pooled:
+        config['ENGINE'] = 'dj_db_conn_pool.backends.postgresql'
+        config['POOL_OPTIONS'] = DATABASE_POOL_OPTIONS
+    return config
+
+
+DATABASES = {
+    'default': database_config(DATABASE_URL),
 }
+for index, url in enumerate(DATABASE_REPLICA_URLS, 1):
+    # Tests run against the primary alone
+    DATABASES[f'replica_{index}'] = {**database_config(url), 'TEST': {'MIRROR': 'default'}}
+
+DATABASE_ROUTERS = ['api.replicas.ReplicaRouter']
 
 
 # Password validation
@@ -143,7 +186,54 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 if not os.path.exists(STATIC_ROOT):
     os.makedirs(STATIC_ROOT)
 
-STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
+# User uploads (moment and profile photos)
+MEDIA_URL = os.environ.get('MEDIA_URL', '/media/')
+MEDIA_ROOT = os.environ.get('MEDIA_ROOT', BASE_DIR / "media")
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# S3-compatible object storage for uploads (AWS, R2, MinIO...), enabled by setting a bucket
+AWS_STORAGE_BUCKET_NAME = os.environ.get('AWS_STORAGE_BUCKET_NAME')
+if AWS_STORAGE_BUCKET_NAME:
+    STORAGES['default'] = {
+        'BACKEND': 'storages.backends.s3.S3Storage',
+        'OPTIONS': {
+            'bucket_name': AWS_STORAGE_BUCKET_NAME,
+            'endpoint_url': os.environ.get('AWS_S3_ENDPOINT_URL'),
+            'region_name': os.environ.get('AWS_S3_REGION_NAME'),
+            'access_key': os.environ.get('AWS_ACCESS_KEY_ID'),
+            'secret_key': os.environ.get('AWS_SECRET_ACCESS_KEY'),
+            'custom_domain': os.environ.get('AWS_S3_CUSTOM_DOMAIN'),
+            'url_protocol': os.environ.get('AWS_S3_URL_PROTOCOL', 'https:'),
+            'querystring_auth': os.environ.get('AWS_QUERYSTRING_AUTH', 'True') == 'True',
+            'file_overwrite': False,
+            # Object names are never reused for different content (see api.media)
+            'object_parameters': {'CacheControl': 'public, max-age=31536000, immutable'},
+        },
+    }
+
+# Direct uploads (see api.uploads): clients PUT images straight to storage
+UPLOAD_URL_EXPIRY_SECONDS = int(os.environ.get('UPLOAD_URL_EXPIRY_SECONDS', 900))
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', 20 * 1024 * 1024))
+# Host clients reach the object store on, when it differs from AWS_S3_ENDPOINT_URL
+# (e.g. MinIO addressed as http://minio:9000 inside docker-compose)
+UPLOAD_PRESIGN_ENDPOINT_URL = os.environ.get('UPLOAD_PRESIGN_ENDPOINT_URL')
+
+# Image pipeline (see api.images): originals are capped and stripped of EXIF,
+# feeds use the thumbnail/medium variants
+IMAGE_MAX_DIMENSION = int(os.environ.get('IMAGE_MAX_DIMENSION', 2048))
+IMAGE_MEDIUM_SIZE = int(os.environ.get('IMAGE_MEDIUM_SIZE', 1080))
+IMAGE_THUMBNAIL_SIZE = int(os.environ.get('IMAGE_THUMBNAIL_SIZE', 320))
+IMAGE_QUALITY = int(os.environ.get('IMAGE_QUALITY', 80))
+# WEBP decodes natively on every client; AVIF is smaller but needs a Pillow built with libavif
+IMAGE_VARIANT_FORMAT = os.environ.get('IMAGE_VARIANT_FORMAT', 'WEBP').upper()
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -156,11 +246,15 @@ AUTH_USER_MODEL = 'core.User'
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
 # Simple JWT Configuration
@@ -184,6 +278,7 @@ CORS_ALLOWED_ORIGINS = [
     "https://pulse-production-f3ba.up.railway.app",
 ]
 CORS_ALLOW_ALL_ORIGINS = True # Set to True for initial production connectivity verification
+CORS_EXPOSE_HEADERS = ['X-Cursor-Older', 'X-Cursor-Newer']
 CSRF_TRUSTED_ORIGINS = [
     "https://pulse-production-f3ba.up.railway.app",
     "https://*.railway.app",
@@ -196,6 +291,49 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
+CELERY_BEAT_SCHEDULE = {
+    'archive-moments': {
+        'task': 'api.tasks.archive_moments_task',
+        'schedule': crontab(minute=0, hour=int(os.environ.get('ARCHIVE_HOUR_UTC', 4))),
+    },
+}
+# Run tasks inline (e.g. for tests or a worker-less dev setup)
+CELERY_TASK_ALWAYS_EAGER = os.environ.get('CELERY_TASK_ALWAYS_EAGER', 'False') == 'True'
+CELERY_TASK_EAGER_PROPAGATES = CELERY_TASK_ALWAYS_EAGER
+
+# Cache Configuration
+# Shared across processes via Redis when available (social graph, etc.)
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL'),
+            'KEY_PREFIX': 'pulse',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    }
+
+# Authenticated users are cached between requests (see api.authentication)
+AUTH_USER_CACHE_TIMEOUT = int(os.environ.get('AUTH_USER_CACHE_TIMEOUT', 300))
+# Serve read-only polling endpoints from the token's claims alone, with no user lookup
+AUTH_STATELESS_READS = os.environ.get('AUTH_STATELESS_READS', 'False') == 'True'
+
+# Social graph cache (see api.graph)
+GRAPH_CACHE_TIMEOUT = int(os.environ.get('GRAPH_CACHE_TIMEOUT', 3600))
+GRAPH_LOCAL_CACHE_SIZE = int(os.environ.get('GRAPH_LOCAL_CACHE_SIZE', 10000))
+
+# Public profile cache (see api.profiles). Keep below AWS_QUERYSTRING_EXPIRE
+# when serving media from a private bucket, as cached photo URLs are presigned.
+PROFILE_CACHE_TIMEOUT = int(os.environ.get('PROFILE_CACHE_TIMEOUT', 300))
+
+# Bursts of pushes of the same type to the same recipient within this many
+# seconds collapse into one summary notification (0 disables coalescing)
+PUSH_COALESCE_WINDOW_SECONDS = int(os.environ.get('PUSH_COALESCE_WINDOW_SECONDS', 60))
 
 # Channels Configuration
 ASGI_APPLICATION = 'pulse_backend.asgi.application'
@@ -218,6 +356,38 @@ else:
         },
     }
 
+# Keyset pagination for feeds and history (see api.pagination)
+KEYSET_PAGE_SIZE = int(os.environ.get('KEYSET_PAGE_SIZE', 50))
+KEYSET_MAX_PAGE_SIZE = int(os.environ.get('KEYSET_MAX_PAGE_SIZE', 200))
+
+# Retention (see api.archive): moments quiet for this many days move to the
+# archive tables, in batches of ARCHIVE_BATCH_SIZE, nightly at ARCHIVE_HOUR_UTC
+ARCHIVE_HORIZON_DAYS = int(os.environ.get('ARCHIVE_HORIZON_DAYS', 365))
+ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', 500))
+# How long feeds trust the cached newest archived moment; archive runs clear it,
+# but only in the cache they share, so keep this short with a per-process cache
+ARCHIVE_BOUNDARY_CACHE_TIMEOUT = int(os.environ.get('ARCHIVE_BOUNDARY_CACHE_TIMEOUT', 300))
+
+# Personal data export (see api.export): rows fetched per database round-trip,
+# and compressed bytes buffered before they are sent
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 2000))
+EXPORT_FLUSH_BYTES = int(os.environ.get('EXPORT_FLUSH_BYTES', 64 * 1024))
+
+# Replies embedded per moment in feed payloads; reply_count carries the total
+FEED_REPLY_LIMIT = int(os.environ.get('FEED_REPLY_LIMIT', 20))
+
+# User search (see api.search)
+SEARCH_RESULT_LIMIT = int(os.environ.get('SEARCH_RESULT_LIMIT', 20))
+SEARCH_MAX_RESULT_LIMIT = int(os.environ.get('SEARCH_MAX_RESULT_LIMIT', 50))
+SEARCH_CANDIDATE_LIMIT = int(os.environ.get('SEARCH_CANDIDATE_LIMIT', 100))
+# Candidate lists for hot prefixes are shared between users while they type
+SEARCH_CACHE_TIMEOUT = int(os.environ.get('SEARCH_CACHE_TIMEOUT', 30))
+
+# Delta Sync Configuration
+SYNC_PAGE_SIZE = int(os.environ.get('SYNC_PAGE_SIZE', 200))
+# Cursors rewind by this much so rows from slow concurrent commits are not missed
+SYNC_CURSOR_OVERLAP_SECONDS = int(os.environ.get('SYNC_CURSOR_OVERLAP_SECONDS', 5))
+
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 DEFAULT_FROM_EMAIL = 'pulseteam@pulse.app'
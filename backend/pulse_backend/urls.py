@@ -14,11 +14,15 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 from django.http import JsonResponse, HttpResponse
 from django.views.decorators.cache import never_cache
 import django
+from api.media import BLOB_PREFIX
+from api.views import MediaBlobView
 
 @never_cache
 def health_check(request):
@@ -51,3 +55,11 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
 ]
+
+if settings.MEDIA_URL.startswith('/'):
+    # Media kept on local storage: content-addressed blobs are served with
+    # immutable caching, anything else only in development
+    urlpatterns += [
+        path(f"{settings.MEDIA_URL.lstrip('/')}{BLOB_PREFIX}<str:shard>/<str:filename>", MediaBlobView.as_view(), name='media-blob'),
+    ]
+    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)